@@ -0,0 +1,187 @@
+"""
+accesso_dati.py
+===============
+Livello di accesso ai dati usato dai tool.
+
+Ogni lettura dichiara un record tipizzato (dataclass con slots): le sue
+proprietà diventano le `return_properties` della query, quindi da Weaviate
+arrivano solo i campi che il tool usa, mai vettori o metadati (salvo
+richiesta esplicita). I record restituiti sono compatti e finiscono così
+nel contesto dell'LLM e nella UI.
+
+Misura prima/dopo (byte, token stimati; latenza con --live):
+    python accesso_dati.py --misura [--live]
+"""
+
+import time
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+# Lunghezza massima delle note della pratica restituite ai tool
+MAX_NOTE = 200
+
+
+@dataclass(slots=True)
+class StatoPratica:
+    codice_pratica: str
+    stato: str = None
+    tipo_soggetto: str = None
+    nome_richiedente: str = None
+    tipo_intervento: str = None
+    indirizzo_impianto: str = None
+    data_lavori_fine: str = None
+    data_invio_domanda: str = None
+    documenti_mancanti: list = None
+    incentivo_annuo_stimato: float = None
+    durata_anni: int = None
+    incentivo_totale_stimato: float = None
+    tecnico_responsabile: str = None
+    note: str = None
+
+
+@dataclass(slots=True)
+class PraticaSintesi:
+    codice_pratica: str
+    nome_richiedente: str = None
+    stato: str = None
+    tipo_intervento: str = None
+
+
+@dataclass(slots=True)
+class ImpiantoCandidato:
+    modello: str
+    marca: str = None
+    tipo: str = None
+    potenza_kw: float = None
+    cop_a7w35: float = None
+    prezzo_indicativo_eur: float = None
+    certificazioni: list = None
+    incentivo_su_prezzo: float = None
+
+
+@dataclass(slots=True)
+class Risultato:
+    records: list
+    stantio: bool = False
+    eta_s: float = 0.0
+
+
+@lru_cache(maxsize=None)
+def _campi(record_cls) -> tuple[str, ...]:
+    return tuple(f.name for f in fields(record_cls))
+
+
+def proprieta(record_cls) -> list[str]:
+    """Proprietà Weaviate da richiedere per un tipo di record."""
+    return list(_campi(record_cls))
+
+
+def crea_record(record_cls, properties: dict):
+    """Costruisce il record dalle proprietà restituite, accorciando le note lunghe."""
+    valori = {nome: properties.get(nome) for nome in _campi(record_cls)}
+    note = valori.get("note")
+    if isinstance(note, str) and len(note) > MAX_NOTE:
+        valori["note"] = note[:MAX_NOTE - 1].rstrip() + "…"
+    return record_cls(**valori)
+
+
+def compatto(record) -> dict:
+    """Record → dizionario senza i campi vuoti (payload per l'LLM e la UI)."""
+    valori = ((nome, getattr(record, nome)) for nome in _campi(type(record)))
+    return {k: v for k, v in valori if v not in (None, [], "")}
+
+
+async def leggi(client_manager, record_cls, collection: str, filters=None, limit: int = 10,
+                sort=None, include_vector: bool = False, return_metadata=None) -> Risultato:
+    """
+    fetch_objects proiettata sulle proprietà di `record_cls`, attraverso il
+    livello condiviso (coalescenza, deadline, hedging, riserva).
+    """
+    from single_flight import fetch_objects_condiviso
+
+    parametri = {}
+    if sort is not None:
+        parametri["sort"] = sort
+    lettura = await fetch_objects_condiviso(
+        client_manager,
+        collection,
+        filters=filters,
+        limit=limit,
+        return_properties=proprieta(record_cls),
+        include_vector=include_vector,
+        return_metadata=return_metadata,
+        **parametri,
+    )
+    records = [crea_record(record_cls, obj.properties) for obj in lettura.risultato.objects]
+    return Risultato(records, lettura.stantio, lettura.eta_s)
+
+
+# ─────────────────────────────────────────
+# MISURA PRIMA / DOPO
+# ─────────────────────────────────────────
+
+def stima_token(testo: str) -> int:
+    """Token del testo (tiktoken se installato, altrimenti ~4 caratteri per token)."""
+    try:
+        import tiktoken
+    except ImportError:
+        return max(1, len(testo) // 4)
+    return len(tiktoken.get_encoding("o200k_base").encode(testo))
+
+
+def misura_payload():
+    """Confronta il payload di controlla_stato_pratica: pratica intera vs record proiettato."""
+    import json
+    from import_data import PRATICHE
+
+    totale_prima = totale_dopo = token_prima = token_dopo = 0
+    for pratica in PRATICHE:
+        # Prima: tutte le proprietà (Weaviate restituisce anche i campi derivati)
+        prima = json.dumps({"pratica_trovata": True, "dettagli": pratica}, ensure_ascii=False, default=str)
+        dopo = json.dumps({"pratica_trovata": True, "dettagli": compatto(crea_record(StatoPratica, pratica))},
+                          ensure_ascii=False, default=str)
+        totale_prima += len(prima.encode("utf-8"))
+        totale_dopo += len(dopo.encode("utf-8"))
+        token_prima += stima_token(prima)
+        token_dopo += stima_token(dopo)
+
+    n = len(PRATICHE)
+    print(f"📊 Payload controlla_stato_pratica (media su {n} pratiche)")
+    print(f"   byte:  {totale_prima / n:8.0f} → {totale_dopo / n:8.0f}  ({100 * (1 - totale_dopo / totale_prima):.0f}% in meno)")
+    print(f"   token: {token_prima / n:8.0f} → {token_dopo / n:8.0f}  ({100 * (1 - token_dopo / token_prima):.0f}% in meno)")
+
+
+def misura_latenza(ripetizioni: int = 20):
+    """Latenza per chiamata su Weaviate: tutte le proprietà vs proiezione."""
+    import json
+    from weaviate.classes.query import Filter
+    from import_data import PRATICHE, get_client
+
+    client = get_client()
+    try:
+        pratiche = client.collections.get("Pratiche")
+        codice = PRATICHE[0]["codice_pratica"]
+        filtro = Filter.by_property("codice_pratica").equal(codice)
+        for nome, kwargs in [("tutte le proprietà", {}), ("proiezione", {"return_properties": proprieta(StatoPratica)})]:
+            tempi = []
+            for _ in range(ripetizioni):
+                t0 = time.perf_counter()
+                res = pratiche.query.fetch_objects(filters=filtro, limit=1, **kwargs)
+                tempi.append(time.perf_counter() - t0)
+            tempi.sort()
+            byte = len(json.dumps(res.objects[0].properties, default=str).encode("utf-8"))
+            print(f"   {nome:<20} p50 {tempi[len(tempi) // 2] * 1000:6.1f} ms   proprietà {byte} byte")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--misura" in sys.argv:
+        misura_payload()
+        if "--live" in sys.argv:
+            print("\n📊 Latenza per chiamata (Weaviate)")
+            misura_latenza()
+    else:
+        print("Uso: python accesso_dati.py --misura [--live]")
@@ -0,0 +1,620 @@
+"""
+carico.py
+=========
+Harness di carico offline per la pianificazione della capacità.
+
+Riproduce un log di domande (dati/query_log.jsonl: le domande di esempio del
+README più il traffico registrato) contro l'app servita
+(`uvicorn servizio:crea_app --factory`, come nel Dockerfile: l'API Elysia
+con i tool di tools.py), senza servizi esterni:
+- LLM: StubLLM, server locale compatibile OpenAI (chat completions ed
+  embedding), deterministico, con latenza e token di output configurabili;
+- Weaviate: istanza locale (docker) popolata con i dati di esempio e vettori
+  dello StubEmbedder.
+
+Per ogni combinazione worker × concorrenza riporta throughput, p50/p99 per
+rotta e per tool, lag dell'event loop dell'app (latenza di una sonda leggera
+sopra quella a riposo) e memoria per sessione (RSS dei processi dell'app).
+Ogni domanda deve passare dal tool indicato nel log: le domande servite da
+un altro tool sono elencate e l'esecuzione termina con exit 1.
+
+Prerequisiti: `pip install websockets` e Weaviate locale:
+    docker run -d -p 8080:8080 -p 50051:50051 --add-host=host.docker.internal:host-gateway \\
+        -e ENABLE_MODULES=text2vec-openai cr.weaviate.io/semitechnologies/weaviate:1.32.0
+
+Uso:
+    python carico.py --seed                                  # popola Weaviate locale
+    python carico.py --workers 1,2,4 --concorrenza 1,8,32    # sweep
+    python carico.py --url http://localhost:8000 --concorrenza 8   # app già avviata
+    python carico.py --solo-stub                             # solo lo StubLLM, per prove manuali
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlparse
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+QUERY_LOG = os.path.join(_DIR, "dati", "query_log.jsonl")
+
+# Endpoint dell'API Elysia usati dal client di carico (aggiornare se cambiano)
+PROTOCOLLO = {
+    "init_utente": "/init/user/{user_id}",
+    "init_tree": "/init/tree/{user_id}/{conversation_id}",
+    "query": "/ws/query",
+    "sonda": "/api/health",
+    # Tipi di messaggio che chiudono la risposta a una domanda
+    "fine": {"completed"},
+    "errore": {"error", "authentication_error"},
+}
+
+COMANDO_APP = "uvicorn servizio:crea_app --factory --host 127.0.0.1 --port {porta} --workers {workers}"
+
+_PAROLE = ("impianto incentivo pratica zona climatica documento pompa calore solare termico "
+           "biomassa soglia conto termico gse domanda istruttoria requisito").split()
+
+
+def carica_log(path: str = QUERY_LOG) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(riga) for riga in f if riga.strip()]
+
+
+def percentile(valori: list[float], p: float) -> float:
+    if not valori:
+        return float("nan")
+    ordinati = sorted(valori)
+    return ordinati[min(len(ordinati) - 1, int(len(ordinati) * p / 100))]
+
+
+# ─────────────────────────────────────────
+# STUB LLM (compatibile OpenAI)
+# ─────────────────────────────────────────
+
+class StubLLM:
+    """
+    Server HTTP locale per /v1/chat/completions (anche in streaming),
+    /v1/embeddings e /v1/models. Le risposte dipendono solo dal prompt.
+
+    Per i prompt DSPy (campi `[[ ## nome ## ]]`) compila i campi di output:
+    la scelta del tool e i suoi argomenti vengono dal log delle domande,
+    i booleani `end*` chiudono l'albero dopo il tool, il resto è testo di riempimento.
+    """
+
+    def __init__(self, log: list[dict] = (), ttft_ms: float = 300, ms_per_token: float = 5,
+                 token_output: int = 80, host: str = "127.0.0.1", porta: int = 0):
+        from embedding_cache import StubEmbedder
+
+        self.log = list(log)
+        self.ttft_ms = ttft_ms
+        self.ms_per_token = ms_per_token
+        self.token_output = token_output
+        self.host = host
+        self.porta = porta
+        self.embedder = StubEmbedder()
+        self.richieste = 0
+        # Domande il cui tool atteso non era tra le opzioni offerte dall'albero
+        self.tool_non_offerti = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host if self.host != '0.0.0.0' else '127.0.0.1'}:{self.porta}/v1"
+
+    async def avvia(self):
+        self._server = await asyncio.start_server(self._connessione, self.host, self.porta)
+        self.porta = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def chiudi(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _connessione(self, reader, writer):
+        try:
+            while True:
+                riga = await reader.readline()
+                if not riga:
+                    break
+                metodo, path, _ = riga.decode("latin-1").split(" ", 2)
+                intestazioni = {}
+                while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    nome, _, valore = h.decode("latin-1").partition(":")
+                    intestazioni[nome.strip().lower()] = valore.strip()
+                corpo = await reader.readexactly(int(intestazioni.get("content-length", 0)))
+                self.richieste += 1
+                continua = await self._rispondi(writer, metodo, path.split("?")[0], corpo)
+                await writer.drain()
+                if not continua or intestazioni.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _rispondi(self, writer, metodo: str, path: str, corpo: bytes) -> bool:
+        """Scrive la risposta; False se la connessione va chiusa (streaming)."""
+        if metodo == "GET" and path.endswith("/models"):
+            return self._json(writer, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        if metodo != "POST":
+            return self._json(writer, {"error": {"message": "not found"}}, stato="404 Not Found")
+
+        richiesta = json.loads(corpo or b"{}")
+        if path.endswith("/embeddings"):
+            testi = richiesta.get("input")
+            testi = [testi] if isinstance(testi, str) else testi
+            vettori = self.embedder([str(t) for t in testi])
+            return self._json(writer, {
+                "object": "list", "model": richiesta.get("model", "stub"),
+                "data": [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vettori)],
+                "usage": {"prompt_tokens": sum(len(str(t)) // 4 for t in testi), "total_tokens": 0},
+            })
+        if not path.endswith("/chat/completions"):
+            return self._json(writer, {"error": {"message": "not found"}}, stato="404 Not Found")
+
+        prompt = "\n".join(m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+                           for m in richiesta.get("messages", []))
+        testo = self.completa(prompt)
+        token = testo.split(" ")
+        await asyncio.sleep(self.ttft_ms / 1000)
+
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": richiesta.get("model", "stub")}
+        if not richiesta.get("stream"):
+            await asyncio.sleep(len(token) * self.ms_per_token / 1000)
+            return self._json(writer, {
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": testo}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(token),
+                          "total_tokens": len(prompt) // 4 + len(token)},
+            })
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+        for i, parola in enumerate(token):
+            delta = {"content": parola if i == 0 else " " + parola}
+            evento = {**base, "object": "chat.completion.chunk",
+                      "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            writer.write(b"data: " + json.dumps(evento).encode() + b"\n\n")
+            await writer.drain()
+            await asyncio.sleep(self.ms_per_token / 1000)
+        fine = {**base, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        writer.write(b"data: " + json.dumps(fine).encode() + b"\n\ndata: [DONE]\n\n")
+        await writer.drain()
+        return False
+
+    @staticmethod
+    def _json(writer, dati, stato: str = "200 OK") -> bool:
+        corpo = json.dumps(dati, ensure_ascii=False).encode("utf-8")
+        writer.write(f"HTTP/1.1 {stato}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(corpo)}\r\n\r\n".encode() + corpo)
+        return True
+
+    def _voce_log(self, prompt: str):
+        for voce in self.log:
+            if voce["query"] in prompt:
+                return voce
+        return None
+
+    def _riempimento(self, prompt: str, n: int) -> str:
+        rnd = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        return " ".join(rnd.choice(_PAROLE) for _ in range(n))
+
+    def completa(self, prompt: str) -> str:
+        """Risposta deterministica al prompt."""
+        uscita = prompt.split("Your output fields are:", 1)
+        if len(uscita) < 2:
+            return self._riempimento(prompt, self.token_output)
+
+        sezione = uscita[1].split("All interactions will be structured", 1)[0]
+        campi = re.findall(r"\d+\.\s+`(\w+)`\s+\(([^)]*(?:\)[^)\n]*)?)\)", sezione)
+        voce = self._voce_log(prompt)
+        parti = []
+        for nome, tipo in campi:
+            tipo_l = tipo.lower()
+            if "function_name" in nome or "literal" in tipo_l:
+                opzioni = re.findall(r"'([^']+)'", tipo)
+                if voce and voce["tool"] in opzioni:
+                    valore = voce["tool"]
+                else:
+                    if voce and opzioni:
+                        self.tool_non_offerti += 1
+                    valore = opzioni[0] if opzioni else (voce["tool"] if voce else "text_response")
+            elif "input" in nome and "dict" in tipo_l:
+                valore = json.dumps(voce["argomenti"] if voce else {}, ensure_ascii=False)
+            elif "bool" in tipo_l:
+                valore = "True" if nome.startswith("end") else "False"
+            elif "int" in tipo_l or "float" in tipo_l:
+                valore = "0"
+            elif "list" in tipo_l:
+                valore = "[]"
+            elif "dict" in tipo_l:
+                valore = "{}"
+            else:
+                valore = self._riempimento(prompt + nome, self.token_output)
+            parti.append(f"[[ ## {nome} ## ]]\n{valore}")
+        parti.append("[[ ## completed ## ]]")
+        return "\n\n".join(parti)
+
+
+# ─────────────────────────────────────────
+# WEAVIATE LOCALE
+# ─────────────────────────────────────────
+
+def popola_weaviate(url_embedding: str, porta: int = 8080, porta_grpc: int = 50051):
+    """Crea le collection su Weaviate locale e importa i dati con vettori dello StubEmbedder."""
+    import tempfile
+    import weaviate
+    from embedding_cache import EmbeddingCache, StubEmbedder
+    from import_data import create_collections, import_all_data, verify_import
+
+    client = weaviate.connect_to_local(port=porta, grpc_port=porta_grpc,
+                                       headers={"X-OpenAI-Api-Key": "stub"})
+    try:
+        create_collections(client, openai_base_url=url_embedding)
+        with tempfile.TemporaryDirectory() as cartella:
+            cache = EmbeddingCache(cartella)
+            import_all_data(client, StubEmbedder(), cache)
+            cache.close()
+        verify_import(client)
+    finally:
+        client.close()
+
+
+# ─────────────────────────────────────────
+# APP SERVITA
+# ─────────────────────────────────────────
+
+def ambiente_app(stub: StubLLM, porta_weaviate: int = 8080, porta_grpc: int = 50051) -> dict:
+    """Variabili d'ambiente per l'app: LLM sullo stub, Weaviate locale."""
+    return {
+        **os.environ,
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": stub.url,
+        "OPENAI_API_BASE": stub.url,
+        "MODEL_API_BASE": stub.url,
+        "BASE_MODEL": "gpt-4.1-mini",
+        "BASE_PROVIDER": "openai",
+        "COMPLEX_MODEL": "gpt-4.1",
+        "COMPLEX_PROVIDER": "openai",
+        "WEAVIATE_IS_LOCAL": "True",
+        "WCD_URL": "localhost",
+        "WCD_API_KEY": "",
+        "LOCAL_WEAVIATE_PORT": str(porta_weaviate),
+        "LOCAL_WEAVIATE_GRPC_PORT": str(porta_grpc),
+        "GEMINI_API_KEY": "",
+    }
+
+
+class App:
+    """Processo dell'app servita (uvicorn con N worker)."""
+
+    def __init__(self, comando: str, porta: int, workers: int, ambiente: dict):
+        self.porta = porta
+        self.processo = subprocess.Popen(
+            comando.format(porta=porta, workers=workers).split(),
+            cwd=_DIR, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.porta}"
+
+    async def pronta(self, timeout_s: float = 120):
+        limite = time.monotonic() + timeout_s
+        while time.monotonic() < limite:
+            if self.processo.poll() is not None:
+                raise RuntimeError(f"l'app è terminata all'avvio (exit {self.processo.returncode})")
+            try:
+                stato, _ = await http(self.url, "GET", PROTOCOLLO["sonda"])
+                if stato < 500:
+                    return
+            except OSError:
+                pass
+            await asyncio.sleep(0.5)
+        raise TimeoutError(f"l'app non risponde su {self.url} dopo {timeout_s:.0f}s")
+
+    def ferma(self):
+        try:
+            os.killpg(self.processo.pid, signal.SIGTERM)
+            self.processo.wait(timeout=15)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            os.killpg(self.processo.pid, signal.SIGKILL)
+
+
+def rss_albero_mb(pid: int) -> float:
+    """RSS (MB) di un processo e dei suoi discendenti, da /proc."""
+    totale = 0
+    da_visitare = [pid]
+    while da_visitare:
+        p = da_visitare.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for riga in f:
+                    if riga.startswith("VmRSS:"):
+                        totale += int(riga.split()[1])
+            with open(f"/proc/{p}/task/{p}/children") as f:
+                da_visitare.extend(int(c) for c in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return totale / 1024
+
+
+# ─────────────────────────────────────────
+# CLIENT DI CARICO
+# ─────────────────────────────────────────
+
+async def http(base_url: str, metodo: str, path: str, corpo: dict = None) -> tuple[int, bytes]:
+    """Richiesta HTTP/1.1 minimale (una connessione per richiesta)."""
+    u = urlparse(base_url)
+    reader, writer = await asyncio.open_connection(u.hostname, u.port or 80)
+    try:
+        dati = json.dumps(corpo).encode() if corpo is not None else b""
+        writer.write(f"{metodo} {path} HTTP/1.1\r\nHost: {u.netloc}\r\nConnection: close\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(dati)}\r\n\r\n".encode() + dati)
+        await writer.drain()
+        risposta = await reader.read()
+    finally:
+        writer.close()
+    intestazione, _, contenuto = risposta.partition(b"\r\n\r\n")
+    return int(intestazione.split(b" ", 2)[1]), contenuto
+
+
+class Metriche:
+    def __init__(self):
+        self.rotte = defaultdict(list)
+        self.tool = defaultdict(list)
+        self.errori = 0
+        self.domande = 0
+        # (domanda, tool atteso, tool scelti) per le domande servite dal tool sbagliato
+        self.tool_errati = []
+
+    def registra(self, gruppo: dict, nome: str, secondi: float):
+        gruppo[nome].append(secondi)
+
+
+def _tool_del_messaggio(messaggio: dict):
+    """Nome del tool scelto dall'albero, se il messaggio lo riporta."""
+    payload = messaggio.get("payload") or {}
+    if messaggio.get("type") == "tree_update" and isinstance(payload, dict):
+        return payload.get("decision") or payload.get("node")
+    return None
+
+
+async def sessione(base_url: str, voci: list[dict], metriche: Metriche):
+    """Un utente virtuale: inizializza utente e conversazione, poi invia le domande in sequenza."""
+    import websockets
+
+    user_id = f"carico-{uuid.uuid4().hex[:8]}"
+    conversation_id = uuid.uuid4().hex
+    for rotta, path in (("POST /init/user", PROTOCOLLO["init_utente"]),
+                        ("POST /init/tree", PROTOCOLLO["init_tree"])):
+        t0 = time.perf_counter()
+        stato, _ = await http(base_url, "POST", path.format(user_id=user_id, conversation_id=conversation_id), {})
+        metriche.registra(metriche.rotte, rotta, time.perf_counter() - t0)
+        if stato >= 400:
+            metriche.errori += 1
+            return
+
+    ws_url = base_url.replace("http", "ws", 1) + PROTOCOLLO["query"]
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        for voce in voci:
+            t0 = time.perf_counter()
+            await ws.send(json.dumps({
+                "user_id": user_id, "conversation_id": conversation_id,
+                "query_id": uuid.uuid4().hex, "query": voce["query"],
+                "collection_names": ["Normative", "Pratiche", "Impianti"],
+                "route": "", "mimick": False,
+            }))
+            primo = None
+            tool_corrente, inizio_tool = None, None
+            scelti = set()
+            while True:
+                messaggio = json.loads(await ws.recv())
+                adesso = time.perf_counter()
+                if primo is None:
+                    primo = adesso - t0
+                nuovo_tool = _tool_del_messaggio(messaggio)
+                tipo = messaggio.get("type")
+                if (nuovo_tool or tipo in PROTOCOLLO["fine"]) and tool_corrente:
+                    metriche.registra(metriche.tool, tool_corrente, adesso - inizio_tool)
+                    tool_corrente = None
+                if nuovo_tool:
+                    tool_corrente, inizio_tool = nuovo_tool, adesso
+                    scelti.add(nuovo_tool)
+                if tipo in PROTOCOLLO["errore"]:
+                    metriche.errori += 1
+                if tipo in PROTOCOLLO["fine"] or tipo in PROTOCOLLO["errore"]:
+                    break
+            metriche.registra(metriche.rotte, "WS /ws/query (primo messaggio)", primo)
+            metriche.registra(metriche.rotte, "WS /ws/query (completa)", time.perf_counter() - t0)
+            metriche.domande += 1
+            if voce.get("tool") and voce["tool"] not in scelti:
+                metriche.tool_errati.append((voce["query"], voce["tool"], sorted(scelti)))
+
+
+async def sonda(base_url: str, stop: asyncio.Event, intervallo_s: float = 0.1) -> list[float]:
+    """Latenze di una richiesta leggera all'app, a intervalli regolari."""
+    latenze = []
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            await http(base_url, "GET", PROTOCOLLO["sonda"])
+            latenze.append(time.perf_counter() - t0)
+        except OSError:
+            pass
+        await asyncio.sleep(intervallo_s)
+    return latenze
+
+
+async def campiona_memoria(pid: int, stop: asyncio.Event, campioni: list, intervallo_s: float = 0.5):
+    while not stop.is_set():
+        campioni.append(rss_albero_mb(pid))
+        await asyncio.sleep(intervallo_s)
+
+
+async def esegui_passo(base_url: str, log: list[dict], concorrenza: int, domande_per_sessione: int,
+                       pid: int = None) -> dict:
+    """Un passo dello sweep: `concorrenza` sessioni parallele, ciascuna con `domande_per_sessione` domande."""
+    riposo = [l for l in [await _latenza_sonda(base_url) for _ in range(10)] if l is not None]
+    memoria_base = rss_albero_mb(pid) if pid else None
+
+    metriche = Metriche()
+    stop = asyncio.Event()
+    campioni = []
+    task_sonda = asyncio.create_task(sonda(base_url, stop))
+    task_memoria = asyncio.create_task(campiona_memoria(pid, stop, campioni)) if pid else None
+
+    async def utente(i):
+        voci = [log[(i + k) % len(log)] for k in range(domande_per_sessione)]
+        try:
+            await sessione(base_url, voci, metriche)
+        except Exception:
+            metriche.errori += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(utente(i) for i in range(concorrenza)))
+    durata = time.perf_counter() - t0
+    stop.set()
+    latenze_sonda = await task_sonda
+    if task_memoria:
+        await task_memoria
+
+    base_sonda = statistics.median(riposo) if riposo else 0.0
+    lag = [max(0.0, l - base_sonda) for l in latenze_sonda]
+    risultato = {
+        "durata_s": durata,
+        "domande": metriche.domande,
+        "throughput": metriche.domande / durata if durata else 0.0,
+        "errori": metriche.errori,
+        "tool_errati": metriche.tool_errati,
+        "rotte": metriche.rotte,
+        "tool": metriche.tool,
+        "lag_p50_ms": percentile(lag, 50) * 1000,
+        "lag_p99_ms": percentile(lag, 99) * 1000,
+    }
+    if pid and campioni:
+        risultato["rss_picco_mb"] = max(campioni)
+        risultato["mb_per_sessione"] = (max(campioni) - memoria_base) / concorrenza
+    return risultato
+
+
+async def _latenza_sonda(base_url: str):
+    t0 = time.perf_counter()
+    try:
+        await http(base_url, "GET", PROTOCOLLO["sonda"])
+    except OSError:
+        return None
+    return time.perf_counter() - t0
+
+
+def stampa_passo(workers, concorrenza: int, r: dict):
+    etichetta = f"workers {workers} · " if workers else ""
+    print(f"\n📊 {etichetta}concorrenza {concorrenza}: {r['throughput']:.2f} domande/s "
+          f"({r['domande']} in {r['durata_s']:.1f}s), errori {r['errori']}")
+    print(f"   {'':<34} {'n':>5} {'p50':>9} {'p99':>9}")
+    for titolo, gruppo in (("rotta", r["rotte"]), ("tool", r["tool"])):
+        for nome, valori in sorted(gruppo.items()):
+            print(f"   {titolo + ' ' + nome:<34} {len(valori):>5} "
+                  f"{percentile(valori, 50) * 1000:7.0f}ms {percentile(valori, 99) * 1000:7.0f}ms")
+    print(f"   lag event loop: p50 {r['lag_p50_ms']:.1f} ms, p99 {r['lag_p99_ms']:.1f} ms")
+    if "rss_picco_mb" in r:
+        print(f"   memoria: RSS picco {r['rss_picco_mb']:.0f} MB, ~{r['mb_per_sessione']:.1f} MB per sessione")
+    if r["tool_errati"]:
+        print(f"   ❌ {len(r['tool_errati'])} domande servite da un tool diverso da quello atteso:")
+        for domanda, atteso, scelti in r["tool_errati"][:5]:
+            print(f"      {domanda[:50]!r}: atteso {atteso}, scelti {', '.join(scelti) or 'nessuno'}")
+
+
+async def sweep(args, log: list[dict]) -> bool:
+    """Esegue lo sweep; False se qualche domanda non è passata dal tool atteso."""
+    ok = True
+    stub = await StubLLM(log, args.llm_ttft_ms, args.llm_ms_token, args.llm_token,
+                         host=args.host_stub, porta=args.porta_stub).avvia()
+    print(f"🤖 StubLLM su {stub.url} (TTFT {args.llm_ttft_ms:g} ms, {args.llm_ms_token:g} ms/token, "
+          f"{args.llm_token} token)")
+    try:
+        if args.url:
+            for concorrenza in args.concorrenza:
+                r = await esegui_passo(args.url, log, concorrenza, args.domande, args.pid)
+                stampa_passo(None, concorrenza, r)
+                ok &= not r["tool_errati"]
+            return ok
+
+        ambiente = ambiente_app(stub, args.porta_weaviate, args.porta_grpc)
+        for workers in args.workers:
+            app = App(args.comando_app, args.porta_app, workers, ambiente)
+            try:
+                await app.pronta()
+                for concorrenza in args.concorrenza:
+                    r = await esegui_passo(app.url, log, concorrenza, args.domande, app.processo.pid)
+                    stampa_passo(workers, concorrenza, r)
+                    ok &= not r["tool_errati"]
+            finally:
+                app.ferma()
+        print(f"\n🤖 Richieste allo StubLLM: {stub.richieste}")
+        if stub.tool_non_offerti:
+            print(f"⚠️  {stub.tool_non_offerti} decisioni senza il tool atteso tra le opzioni "
+                  f"(tool personalizzati non registrati nell'app?)")
+        return ok
+    finally:
+        await stub.chiudi()
+
+
+def _lista_interi(testo: str) -> list[int]:
+    return [int(x) for x in testo.split(",") if x.strip()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Harness di carico offline (LLM stub, Weaviate locale)")
+    parser.add_argument("--log", default=QUERY_LOG, help="Log delle domande (JSONL: query, tool, argomenti)")
+    parser.add_argument("--workers", type=_lista_interi, default=[1], help="es. 1,2,4")
+    parser.add_argument("--concorrenza", type=_lista_interi, default=[1, 8, 32], help="sessioni parallele, es. 1,8,32")
+    parser.add_argument("--domande", type=int, default=5, help="domande per sessione")
+    parser.add_argument("--url", help="App già avviata (nessun processo gestito dall'harness)")
+    parser.add_argument("--pid", type=int, help="PID dell'app già avviata, per la memoria")
+    parser.add_argument("--comando-app", default=COMANDO_APP)
+    parser.add_argument("--porta-app", type=int, default=8100)
+    parser.add_argument("--llm-ttft-ms", type=float, default=300)
+    parser.add_argument("--llm-ms-token", type=float, default=5)
+    parser.add_argument("--llm-token", type=int, default=80)
+    parser.add_argument("--host-stub", default="0.0.0.0", help="0.0.0.0 per renderlo raggiungibile da docker")
+    parser.add_argument("--porta-stub", type=int, default=8765)
+    parser.add_argument("--porta-weaviate", type=int, default=8080)
+    parser.add_argument("--porta-grpc", type=int, default=50051)
+    parser.add_argument("--seed", action="store_true", help="Popola Weaviate locale con i dati di esempio")
+    parser.add_argument("--solo-stub", action="store_true", help="Avvia solo lo StubLLM")
+    args = parser.parse_args()
+    log = carica_log(args.log)
+
+    if args.seed:
+        # Weaviate (in docker) chiama lo StubLLM per gli embedding delle query
+        popola_weaviate(f"http://host.docker.internal:{args.porta_stub}", args.porta_weaviate, args.porta_grpc)
+    elif args.solo_stub:
+        async def _solo_stub():
+            stub = await StubLLM(log, args.llm_ttft_ms, args.llm_ms_token, args.llm_token,
+                                 host=args.host_stub, porta=args.porta_stub).avvia()
+            print(f"🤖 StubLLM su {stub.url} (Ctrl+C per terminare)")
+            await asyncio.Event().wait()
+
+        try:
+            asyncio.run(_solo_stub())
+        except KeyboardInterrupt:
+            pass
+    else:
+        try:
+            sys.exit(0 if asyncio.run(sweep(args, log)) else 1)
+        except KeyboardInterrupt:
+            sys.exit(130)
@@ -0,0 +1,288 @@
+"""
+documenti.py
+============
+Motore di completezza documentale delle pratiche, basato su bitmask.
+
+Il catalogo dei documenti è internato in ID interi (la posizione nella lista
+CATALOGO_DOCUMENTI, che quindi si estende solo in coda). Per ogni pratica:
+    presenti  = bitmask dei documenti caricati
+    richiesti = bitmask dei documenti obbligatori per la checklist
+                (intervento, tipo soggetto, procedura di accesso)
+    mancanti  = richiesti & ~presenti
+
+Su Weaviate ogni pratica memorizza `documenti_presenti_mask` (int) e
+`documenti_mancanti_ids` (int[]): "pratiche senza il documento X" è un
+singolo filtro indicizzato. I mancanti indicati a mano restano separati in
+`documenti_mancanti_manuali` (text[]), così un ricalcolo dopo un cambio di
+regole toglie i documenti non più richiesti.
+
+Uso:
+    python documenti.py --ricalcola [--dry-run]   # ricalcola tutto il portafoglio
+    python documenti.py --benchmark 1000000       # pratiche/s su portafoglio sintetico
+"""
+
+import time
+import unicodedata
+from functools import lru_cache
+
+from regole_ct import SEZIONI_CHECKLIST, genera_checklist
+
+# ID documento = indice nella lista. Aggiungere solo in coda: gli ID sono salvati su Weaviate.
+CATALOGO_DOCUMENTI = [
+    "Relazione tecnica descrittiva",
+    "Documentazione fotografica ante-operam",
+    "Documentazione fotografica post-operam",
+    "Fatture/ricevute pagamento tracciabili",
+    "Schede tecniche componenti (con marcatura CE)",
+    "Dichiarazione di conformità impianto",
+    "Certificato test EN 14511 o EHPA Gold",
+    "Documentazione dismissione vecchio generatore",
+    "Certificazione Solar Keymark",
+    "Schema dell'impianto idraulico",
+    "Certificato emissioni EN 303-5",
+    "Analisi combustibile (se non pellet certificato)",
+    "APE pre-intervento",
+    "APE post-intervento",
+    "Delibera/determinazione di affidamento lavori",
+    "Domanda di prenotazione preventiva",
+    "Preventivo dettagliato lavori",
+]
+
+# Nomi usati a mano nelle pratiche → documenti del catalogo
+ALIAS_DOCUMENTI = {
+    "Relazione tecnica": ["Relazione tecnica descrittiva"],
+    "Foto ante-operam": ["Documentazione fotografica ante-operam"],
+    "Foto post-operam": ["Documentazione fotografica post-operam"],
+    "Fatture": ["Fatture/ricevute pagamento tracciabili"],
+    "Scheda tecnica": ["Schede tecniche componenti (con marcatura CE)"],
+    "Solar Keymark": ["Certificazione Solar Keymark"],
+    "Certificato emissioni (EN 303-5)": ["Certificato emissioni EN 303-5"],
+    "APE pre e post": ["APE pre-intervento", "APE post-intervento"],
+}
+
+# Una bitmask deve stare in un INT di Weaviate (int64 con segno)
+assert len(CATALOGO_DOCUMENTI) <= 63, "Catalogo documenti oltre i 63 bit di documenti_presenti_mask"
+
+# Soglia di incentivo annuo oltre la quale si accede a prenotazione
+SOGLIA_PRENOTAZIONE_EUR = 5000
+
+# Pratiche chiuse: la checklist non si applica più, restano solo i mancanti inseriti a mano
+STATI_DEFINITIVI = {"approvata", "rigettata"}
+
+
+def normalizza(nome: str) -> str:
+    """Minuscolo, senza accenti e spazi superflui."""
+    nome = unicodedata.normalize("NFKD", nome.casefold())
+    return " ".join("".join(c for c in nome if not unicodedata.combining(c)).split())
+
+
+_ID_PER_NOME = {normalizza(nome): i for i, nome in enumerate(CATALOGO_DOCUMENTI)}
+for _alias, _nomi in ALIAS_DOCUMENTI.items():
+    _ID_PER_NOME[normalizza(_alias)] = [CATALOGO_DOCUMENTI.index(n) for n in _nomi]
+
+
+@lru_cache(maxsize=4096)
+def ids_documento(nome: str) -> tuple[int, ...]:
+    """ID del catalogo corrispondenti a un nome (un alias può valere più documenti)."""
+    ids = _ID_PER_NOME.get(normalizza(nome))
+    if ids is None:
+        return ()
+    return tuple(ids) if isinstance(ids, list) else (ids,)
+
+
+def cerca_documento(testo: str) -> list[int]:
+    """Risolve un nome approssimativo: corrispondenza esatta/alias, altrimenti sottostringa."""
+    ids = ids_documento(testo)
+    if ids:
+        return list(ids)
+    cercato = normalizza(testo)
+    return [i for i, nome in enumerate(CATALOGO_DOCUMENTI) if cercato in normalizza(nome)]
+
+
+def maschera(nomi: list[str]) -> tuple[int, list[str]]:
+    """Bitmask dei documenti e lista dei nomi non riconosciuti."""
+    bits = 0
+    sconosciuti = []
+    for nome in nomi or []:
+        ids = ids_documento(nome)
+        if not ids:
+            sconosciuti.append(nome)
+        for i in ids:
+            bits |= 1 << i
+    return bits, sconosciuti
+
+
+def nomi_da_maschera(bits: int) -> list[str]:
+    return [nome for i, nome in enumerate(CATALOGO_DOCUMENTI) if bits >> i & 1]
+
+
+def ids_da_maschera(bits: int) -> list[int]:
+    return [i for i in range(len(CATALOGO_DOCUMENTI)) if bits >> i & 1]
+
+
+@lru_cache(maxsize=None)
+def maschera_requisiti(tipo_intervento: str, tipo_soggetto: str, tipo_accesso: str) -> int:
+    """Bitmask dei documenti obbligatori della checklist (calcolata una volta per combinazione)."""
+    checklist = genera_checklist(tipo_intervento, tipo_soggetto, tipo_accesso)
+    bits = 0
+    for sezione in SEZIONI_CHECKLIST:
+        for d in checklist[sezione]:
+            if d["obbligatorio"]:
+                bits |= 1 << CATALOGO_DOCUMENTI.index(d["doc"])
+    return bits
+
+
+def profilo_checklist(pratica: dict) -> tuple[str, str, str]:
+    """(tipo_intervento, tipo_soggetto, tipo_accesso) della checklist che si applica alla pratica."""
+    soggetto = (pratica.get("tipo_soggetto") or "").lower()
+    tipo_soggetto = "pa" if soggetto in ("pa", "pubblica amministrazione") else "privato"
+    incentivo = pratica.get("incentivo_annuo_stimato") or 0
+    tipo_accesso = "prenotazione" if incentivo >= SOGLIA_PRENOTAZIONE_EUR else "diretto"
+    return pratica.get("tipo_intervento") or "", tipo_soggetto, tipo_accesso
+
+
+def mancanti_manuali(pratica: dict) -> list[str]:
+    """
+    Documenti mancanti indicati a mano. Se la pratica non ha ancora
+    `documenti_mancanti_manuali` sono i `documenti_mancanti` di origine; se questi
+    sono già stati derivati in un calcolo precedente (`documenti_mancanti_ids`
+    presente), solo quelli che la checklist attuale non richiede.
+    """
+    manuali = pratica.get("documenti_mancanti_manuali")
+    if manuali is not None:
+        return list(manuali)
+    nomi = pratica.get("documenti_mancanti") or []
+    if pratica.get("documenti_mancanti_ids") is None:
+        return list(nomi)
+    richiesti = maschera_requisiti(*profilo_checklist(pratica))
+    return [nome for nome in nomi if not ids_documento(nome) or any(not richiesti >> i & 1 for i in ids_documento(nome))]
+
+
+def completezza(pratica: dict) -> dict:
+    """
+    Proprietà derivate della pratica: maschera dei presenti e documenti mancanti.
+    I mancanti sono quelli richiesti dalla checklist più quelli indicati a mano
+    (non ancora caricati); i nomi fuori catalogo sono mantenuti in coda. Per le
+    pratiche in stato definitivo la checklist non viene riapplicata.
+    """
+    manuali = mancanti_manuali(pratica)
+    presenti, _ = maschera(pratica.get("documenti_presenti"))
+    indicati, altri = maschera(manuali)
+    richiesti = 0
+    if (pratica.get("stato") or "").lower() not in STATI_DEFINITIVI:
+        richiesti = maschera_requisiti(*profilo_checklist(pratica))
+    mancanti = (richiesti | indicati) & ~presenti
+    return {
+        "documenti_presenti_mask": presenti,
+        "documenti_mancanti_ids": ids_da_maschera(mancanti),
+        "documenti_mancanti": nomi_da_maschera(mancanti) + altri,
+        "documenti_mancanti_manuali": manuali,
+    }
+
+
+def non_riconosciuti(pratica: dict) -> list[str]:
+    """Nomi di documenti (presenti o mancanti) che non corrispondono al catalogo né a un alias."""
+    _, presenti = maschera(pratica.get("documenti_presenti"))
+    _, mancanti = maschera(mancanti_manuali(pratica))
+    return presenti + mancanti
+
+
+def ricalcola_portafoglio(pratiche, sconosciuti: dict = None) -> list[tuple[str, dict]]:
+    """
+    Ricalcola in un solo passaggio la completezza di (uuid, pratica) e
+    restituisce solo le pratiche con differenze. Se passato, `sconosciuti`
+    raccoglie {uuid: nomi fuori catalogo}.
+    """
+    cambiate = []
+    for uuid, pratica in pratiche:
+        nuovo = completezza(pratica)
+        if any(pratica.get(k) != v for k, v in nuovo.items()):
+            cambiate.append((uuid, nuovo))
+        if sconosciuti is not None:
+            nomi = non_riconosciuti(pratica)
+            if nomi:
+                sconosciuti[uuid] = nomi
+    return cambiate
+
+
+# ─────────────────────────────────────────
+# JOB SU WEAVIATE
+# ─────────────────────────────────────────
+
+PROPRIETA_COMPLETEZZA = [
+    "codice_pratica", "stato", "tipo_intervento", "tipo_soggetto", "incentivo_annuo_stimato",
+    "documenti_presenti", "documenti_mancanti", "documenti_presenti_mask", "documenti_mancanti_ids",
+    "documenti_mancanti_manuali",
+]
+
+
+def assicura_proprieta(coll):
+    """Aggiunge le proprietà derivate alle collection create prima della loro introduzione."""
+    from weaviate.classes.config import Property, DataType
+
+    esistenti = {p.name for p in coll.config.get().properties}
+    if "documenti_presenti_mask" not in esistenti:
+        coll.config.add_property(Property(name="documenti_presenti_mask", data_type=DataType.INT))
+    if "documenti_mancanti_ids" not in esistenti:
+        coll.config.add_property(Property(name="documenti_mancanti_ids", data_type=DataType.INT_ARRAY))
+    if "documenti_mancanti_manuali" not in esistenti:
+        coll.config.add_property(Property(name="documenti_mancanti_manuali", data_type=DataType.TEXT_ARRAY))
+
+
+def ricalcola(client, dry_run: bool = False):
+    coll = client.collections.get("Pratiche")
+    if not dry_run:
+        assicura_proprieta(coll)
+
+    t0 = time.perf_counter()
+    oggetti = (
+        (str(obj.uuid), obj.properties)
+        for obj in coll.iterator(return_properties=PROPRIETA_COMPLETEZZA)
+    )
+    sconosciuti = {}
+    cambiate = ricalcola_portafoglio(oggetti, sconosciuti)
+    for uuid, nuovo in cambiate[:20]:
+        print(f"  🔄 {uuid}: mancanti {nuovo['documenti_mancanti'] or '-'}")
+    for uuid, nomi in sconosciuti.items():
+        print(f"  ⚠️  {uuid}: documenti non riconosciuti {nomi} (aggiungere un alias in ALIAS_DOCUMENTI)")
+
+    if not dry_run:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda c: coll.data.update(uuid=c[0], properties=c[1]), cambiate))
+
+    print(f"\n✅ {len(cambiate)} pratiche aggiornate{' (dry-run)' if dry_run else ''} "
+          f"in {time.perf_counter() - t0:.2f}s")
+
+
+def benchmark(n: int):
+    from export_pratiche import pratiche_sintetiche
+
+    portafoglio = [(str(i), p) for i, p in enumerate(pratiche_sintetiche(n))]
+    t0 = time.perf_counter()
+    cambiate = ricalcola_portafoglio(portafoglio)
+    durata = time.perf_counter() - t0
+    print(f"📊 {n:,} pratiche ricalcolate in {durata:.2f}s ({n / durata:,.0f} pratiche/s), {len(cambiate):,} cambiate")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Completezza documentale delle pratiche")
+    parser.add_argument("--ricalcola", action="store_true", help="Ricalcola il portafoglio su Weaviate")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--benchmark", type=int, metavar="N")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.ricalcola:
+        from import_data import get_client
+
+        client = get_client()
+        try:
+            ricalcola(client, args.dry_run)
+        finally:
+            client.close()
+    else:
+        parser.print_help()
@@ -0,0 +1,248 @@
+"""
+embedding_cache.py
+==================
+Cache locale degli embedding, indirizzata per contenuto.
+
+Ogni vettore è identificato da hash(modello + testo): reimportare un corpus
+invariato non richiede alcuna chiamata all'API di embedding.
+
+Struttura su disco (una cartella per modello):
+    meta.json    ← modello, dimensione, tipo (float16/float32)
+    vectors.bin  ← blocco di vettori a larghezza fissa, letto via mmap
+    index.bin    ← record (digest 16 byte, slot uint32) in sola aggiunta
+    lock         ← flock esclusivo durante le aggiunte (più processi possono
+                   importare insieme, es. main.py e snapshot.py confronta)
+
+Verifica con l'embedder fittizio (nessuna rete):
+    python embedding_cache.py --verifica
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MODEL = "text-embedding-3-small"
+DEFAULT_DIM = 1536
+CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(".cache", "embeddings"))
+
+_DTYPE_FORMAT = {"float16": "e", "float32": "f"}
+_INDEX_RECORD = struct.Struct("<16sI")
+
+
+def chiave_testo(model: str, testo: str) -> bytes:
+    """Digest (16 byte) che identifica il vettore di `testo` per `model`."""
+    return hashlib.sha256(f"{model}\0{testo}".encode("utf-8")).digest()[:16]
+
+
+class EmbeddingCache:
+    """Cache su disco dei vettori, con lettura via mmap."""
+
+    def __init__(self, path: str = CACHE_DIR, model: str = DEFAULT_MODEL,
+                 dim: int = DEFAULT_DIM, dtype: str = "float16"):
+        if dtype not in _DTYPE_FORMAT:
+            raise ValueError(f"dtype non supportato: {dtype} (usa float16 o float32)")
+
+        self.model = model
+        self.dir = os.path.join(path, model.replace("/", "_"))
+        os.makedirs(self.dir, exist_ok=True)
+
+        meta_path = os.path.join(self.dir, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dim"] != dim or meta["dtype"] != dtype:
+                raise ValueError(
+                    f"Cache in {self.dir} creata con dim={meta['dim']}, dtype={meta['dtype']}: "
+                    f"richiesto dim={dim}, dtype={dtype}"
+                )
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": model, "dim": dim, "dtype": dtype}, f)
+
+        self.dim = dim
+        self.dtype = dtype
+        self._record = struct.Struct(f"<{dim}{_DTYPE_FORMAT[dtype]}")
+        self._vectors_path = os.path.join(self.dir, "vectors.bin")
+        self._index_path = os.path.join(self.dir, "index.bin")
+        self._lock_path = os.path.join(self.dir, "lock")
+        self._lock = threading.Lock()
+        self._mmap = None
+        self._index = self._load_index()
+        self._remap()
+
+    def _load_index(self) -> dict:
+        index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, "rb") as f:
+                data = f.read()
+            # Un record troncato (scrittura interrotta) viene ignorato
+            usable = len(data) - len(data) % _INDEX_RECORD.size
+            for digest, slot in _INDEX_RECORD.iter_unpack(data[:usable]):
+                index[digest] = slot
+        return index
+
+    def _remap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > 0:
+            with open(self._vectors_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, testo: str) -> bool:
+        return chiave_testo(self.model, testo) in self._index
+
+    def get(self, testo: str):
+        """Restituisce il vettore in cache per `testo`, oppure None."""
+        slot = self._index.get(chiave_testo(self.model, testo))
+        if slot is None:
+            return None
+        return list(self._record.unpack_from(self._mmap, slot * self._record.size))
+
+    def put_many(self, testi: list[str], vettori: list[list[float]]):
+        """Aggiunge in coda i vettori non ancora presenti."""
+        with self._lock:
+            nuovi = []
+            for testo, vettore in zip(testi, vettori):
+                digest = chiave_testo(self.model, testo)
+                if digest in self._index:
+                    continue
+                if len(vettore) != self.dim:
+                    raise ValueError(f"Vettore di dimensione {len(vettore)}, attesa {self.dim}")
+                nuovi.append((digest, vettore))
+            if not nuovi:
+                return
+
+            # Il lock del thread non basta tra processi: senza flock due import
+            # concorrenti potrebbero intercalare i record o troncare l'uno il
+            # record in scrittura dell'altro
+            with open(self._lock_path, "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._aggiungi(nuovi)
+            self._remap()
+
+    def _aggiungi(self, nuovi: list):
+        """Scrive vettori e record di indice: va chiamato con il flock acquisito."""
+        with open(self._vectors_path, "ab") as f:
+            dimensione = f.tell()
+            parziale = dimensione % self._record.size
+            if parziale:
+                # Record troncato da una scrittura interrotta: va scartato,
+                # altrimenti i nuovi vettori finirebbero fuori dal loro slot
+                self.close()
+                f.truncate(dimensione - parziale)
+                f.seek(0, os.SEEK_END)
+            primo_slot = f.tell() // self._record.size
+            f.write(b"".join(self._record.pack(*v) for _, v in nuovi))
+        with open(self._index_path, "ab") as f:
+            for offset, (digest, _) in enumerate(nuovi):
+                f.write(_INDEX_RECORD.pack(digest, primo_slot + offset))
+                self._index[digest] = primo_slot + offset
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+# ─────────────────────────────────────────
+# EMBEDDER
+# ─────────────────────────────────────────
+
+class OpenAIEmbedder:
+    """Chiama l'endpoint /v1/embeddings di OpenAI (lo stesso modello di text2vec_openai)."""
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, timeout: float = 60.0):
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.calls = 0
+
+    def __call__(self, testi: list[str]) -> list[list[float]]:
+        self.calls += 1
+        req = urllib.request.Request(
+            "https://api.openai.com/v1/embeddings",
+            data=json.dumps({"model": self.model, "input": testi}).encode("utf-8"),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            body = json.load(resp)
+        dati = sorted(body["data"], key=lambda d: d["index"])
+        return [d["embedding"] for d in dati]
+
+
+class StubEmbedder:
+    """Embedder locale deterministico: nessuna rete, conta le chiamate."""
+
+    def __init__(self, model: str = DEFAULT_MODEL, dim: int = DEFAULT_DIM):
+        self.model = model
+        self.dim = dim
+        self.calls = 0
+        self.testi = 0
+
+    def __call__(self, testi: list[str]) -> list[list[float]]:
+        self.calls += 1
+        self.testi += len(testi)
+        vettori = []
+        for testo in testi:
+            seme = hashlib.sha256(testo.encode("utf-8")).digest()
+            vettori.append([(seme[i % len(seme)] - 128) / 128 for i in range(self.dim)])
+        return vettori
+
+
+def embed_con_cache(testi: list[str], cache: EmbeddingCache, embedder,
+                    batch_size: int = 64, workers: int = 4) -> list[list[float]]:
+    """
+    Restituisce i vettori di `testi` nello stesso ordine.
+    Solo i testi assenti dalla cache (deduplicati) vengono inviati all'embedder,
+    in batch paralleli.
+    """
+    mancanti = list(dict.fromkeys(t for t in testi if t not in cache))
+    if mancanti:
+        lotti = [mancanti[i:i + batch_size] for i in range(0, len(mancanti), batch_size)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for lotto, vettori in zip(lotti, pool.map(embedder, lotti)):
+                cache.put_many(lotto, vettori)
+    return [cache.get(t) for t in testi]
+
+
+def verifica_cache(path: str) -> bool:
+    """Due importazioni dello stesso corpus: la seconda non deve chiamare l'embedder."""
+    from import_data import COLLECTION_DATA, SOURCE_PROPERTIES, testo_da_vettorizzare
+
+    testi = [
+        testo_da_vettorizzare(nome, item, SOURCE_PROPERTIES[nome])
+        for nome, dati in COLLECTION_DATA.items()
+        for item in dati
+    ]
+
+    for passaggio in (1, 2):
+        cache = EmbeddingCache(path)
+        stub = StubEmbedder()
+        embed_con_cache(testi, cache, stub)
+        cache.close()
+        print(f"  Passaggio {passaggio}: {stub.calls} chiamate, {stub.testi} testi vettorizzati")
+    return stub.calls == 0
+
+
+if __name__ == "__main__":
+    if "--verifica" in sys.argv:
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = verifica_cache(tmp)
+        print("✅ Reimportazione senza chiamate di embedding" if ok else "❌ La cache non è stata usata")
+        sys.exit(0 if ok else 1)
+    print("Uso: python embedding_cache.py --verifica")
@@ -0,0 +1,293 @@
+"""
+export_pratiche.py
+==================
+Export in streaming delle pratiche (o di qualsiasi collection) per il
+reporting mensile GSE.
+
+La collection viene letta con l'iteratore a cursore di Weaviate, pagina per
+pagina, proiettando solo le proprietà richieste e senza vettori: la memoria
+resta costante indipendentemente dal numero di oggetti.
+
+Uso:
+    python export_pratiche.py report.csv
+    python export_pratiche.py report.parquet --proprieta codice_pratica stato
+    python export_pratiche.py report.jsonl --tenant T1 T2 --workers 2
+    python export_pratiche.py --benchmark 1000000 --formato parquet   # collection sintetica
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from types import SimpleNamespace
+
+PROPRIETA_REPORT = [
+    "codice_pratica",
+    "tipo_soggetto",
+    "nome_richiedente",
+    "tipo_intervento",
+    "stato",
+    "data_lavori_fine",
+    "data_invio_domanda",
+    "documenti_presenti",
+    "documenti_mancanti",
+    "incentivo_annuo_stimato",
+    "durata_anni",
+    "incentivo_totale_stimato",
+]
+
+# ─────────────────────────────────────────
+# WRITER
+# ─────────────────────────────────────────
+
+class CSVWriter:
+    """Le liste (es. documenti_mancanti) sono unite con '; '."""
+
+    def __init__(self, path: str, campi: list[str], tipi: dict = None):
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._f, fieldnames=campi, extrasaction="ignore")
+        self._writer.writeheader()
+
+    def scrivi(self, righe: list[dict]):
+        for riga in righe:
+            self._writer.writerow({
+                k: "; ".join(map(str, v)) if isinstance(v, list) else v for k, v in riga.items()
+            })
+
+    def chiudi(self):
+        self._f.close()
+
+
+class JSONLWriter:
+    def __init__(self, path: str, campi: list[str], tipi: dict = None):
+        self._f = open(path, "w", encoding="utf-8")
+        self._campi = campi
+
+    def scrivi(self, righe: list[dict]):
+        self._f.writelines(
+            json.dumps({k: riga.get(k) for k in self._campi}, ensure_ascii=False, default=str) + "\n"
+            for riga in righe
+        )
+
+    def chiudi(self):
+        self._f.close()
+
+
+class ParquetWriter:
+    """Ogni pagina diventa un row group: in memoria resta una sola pagina."""
+
+    def __init__(self, path: str, campi: list[str], tipi: dict = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("L'export Parquet richiede pyarrow: pip install pyarrow") from e
+        from snapshot import tipo_arrow
+
+        tipi = tipi or {}
+        self._pa = pa
+        self._campi = campi
+        self._schema = pa.schema([(c, tipo_arrow(pa, tipi.get(c, "text"))) for c in campi])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def scrivi(self, righe: list[dict]):
+        colonne = {c: [riga.get(c) for riga in righe] for c in self._campi}
+        self._writer.write_table(self._pa.Table.from_pydict(colonne, schema=self._schema))
+
+    def chiudi(self):
+        self._writer.close()
+
+
+WRITERS = {"csv": CSVWriter, "jsonl": JSONLWriter, "parquet": ParquetWriter}
+
+
+def formato_da_path(path: str) -> str:
+    estensione = os.path.splitext(path)[1].lstrip(".").lower()
+    if estensione not in WRITERS:
+        raise ValueError(f"Formato '{estensione}' non supportato: usa {', '.join(WRITERS)}")
+    return estensione
+
+
+# ─────────────────────────────────────────
+# EXPORT
+# ─────────────────────────────────────────
+
+def scrivi_a_pagine(righe, writer, page_size: int = 1000) -> int:
+    """Consuma un iterabile di righe scrivendole a pagine. Restituisce il numero di righe."""
+    pagina = []
+    totale = 0
+    for riga in righe:
+        pagina.append(riga)
+        if len(pagina) >= page_size:
+            writer.scrivi(pagina)
+            totale += len(pagina)
+            pagina = []
+    if pagina:
+        writer.scrivi(pagina)
+        totale += len(pagina)
+    return totale
+
+
+def tipi_proprieta(collection) -> dict:
+    """{nome_proprietà: tipo Weaviate} letto dalla configurazione della collection."""
+    return {
+        p.name: getattr(p.data_type, "value", str(p.data_type))
+        for p in collection.config.get().properties
+    }
+
+
+def esporta_collection(collection, destinazione: str, proprieta: list[str] = None,
+                       formato: str = None, page_size: int = 1000) -> int:
+    """
+    Esporta una collection (o un tenant) in `destinazione` senza vettori né metadati.
+    Restituisce il numero di righe scritte.
+    """
+    proprieta = proprieta or PROPRIETA_REPORT
+    formato = formato or formato_da_path(destinazione)
+    writer = WRITERS[formato](destinazione, proprieta, tipi_proprieta(collection))
+    try:
+        oggetti = collection.iterator(
+            include_vector=False,
+            return_properties=proprieta,
+            cache_size=page_size,
+        )
+        return scrivi_a_pagine((obj.properties for obj in oggetti), writer, page_size)
+    finally:
+        writer.chiudi()
+
+
+def esporta(client, destinazione: str, collection: str = "Pratiche", proprieta: list[str] = None,
+            formato: str = None, page_size: int = 1000, tenant: list[str] = None,
+            workers: int = 4) -> int:
+    """
+    Export della collection. Con `tenant` ogni tenant è esportato in parallelo
+    in un file separato (<nome>.<tenant>.<estensione>).
+    """
+    coll = client.collections.get(collection)
+    if not tenant:
+        return esporta_collection(coll, destinazione, proprieta, formato, page_size)
+
+    radice, estensione = os.path.splitext(destinazione)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(esporta_collection, coll.with_tenant(t), f"{radice}.{t}{estensione}",
+                        proprieta, formato or formato_da_path(destinazione), page_size)
+            for t in tenant
+        ]
+        return sum(f.result() for f in futures)
+
+
+# ─────────────────────────────────────────
+# BENCHMARK
+# ─────────────────────────────────────────
+
+def pratiche_sintetiche(n: int):
+    """Generatore di `n` pratiche sintetiche (non materializzate in memoria)."""
+    interventi = ["B.2 - Pompa di calore aria-acqua", "B.4 - Solare termico",
+                  "B.5 - Caldaia a biomassa (pellet)", "B.3 - Scaldacqua a pompa di calore"]
+    stati = ["In istruttoria", "Approvata", "Rigettata", "Bozza - non ancora inviata"]
+    documenti = ["Relazione tecnica", "Foto ante-operam", "Foto post-operam", "Fatture",
+                 "Scheda tecnica", "Dichiarazione di conformità impianto"]
+    for i in range(n):
+        k = i % 6
+        annuo = 300.0 + (i % 5000)
+        yield {
+            "codice_pratica": f"CT-{2020 + i % 5}-{i:06d}",
+            "tipo_soggetto": "Privato" if i % 7 else "Pubblica Amministrazione",
+            "nome_richiedente": f"Richiedente {i}",
+            "tipo_intervento": interventi[i % 4],
+            "stato": stati[i % 4],
+            "data_lavori_fine": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "data_invio_domanda": None if i % 4 == 3 else f"2024-{1 + i % 12:02d}-28",
+            "documenti_presenti": documenti[:k],
+            "documenti_mancanti": documenti[k:],
+            "incentivo_annuo_stimato": annuo,
+            "durata_anni": 5,
+            "incentivo_totale_stimato": annuo * 5,
+        }
+
+
+class CollectionSintetica:
+    """
+    Collection finta per il benchmark: espone `config.get()` e `iterator()`
+    come una collection Weaviate, restituendo a pagine di `cache_size` le
+    pratiche di `pratiche_sintetiche(n)`.
+    """
+
+    TIPI = {
+        "codice_pratica": "text", "tipo_soggetto": "text", "nome_richiedente": "text",
+        "tipo_intervento": "text", "stato": "text", "data_lavori_fine": "text",
+        "data_invio_domanda": "text", "documenti_presenti": "text[]",
+        "documenti_mancanti": "text[]", "incentivo_annuo_stimato": "number",
+        "durata_anni": "int", "incentivo_totale_stimato": "number",
+    }
+
+    def __init__(self, n: int):
+        self._n = n
+        proprieta = [
+            SimpleNamespace(name=nome, data_type=SimpleNamespace(value=tipo))
+            for nome, tipo in self.TIPI.items()
+        ]
+        self.config = SimpleNamespace(get=lambda: SimpleNamespace(properties=proprieta))
+
+    def iterator(self, include_vector: bool = False, return_properties: list[str] = None,
+                 cache_size: int = 100):
+        campi = return_properties or list(self.TIPI)
+        pratiche = pratiche_sintetiche(self._n)
+        while pagina := list(islice(pratiche, cache_size)):
+            for p in pagina:
+                yield SimpleNamespace(properties={c: p.get(c) for c in campi})
+
+
+def benchmark(n: int, formato: str, page_size: int = 1000):
+    """
+    Throughput di `esporta_collection` (righe/s) e picco di memoria su una
+    collection sintetica di `n` pratiche: copre iteratore a pagine e writer,
+    non la latenza di rete verso Weaviate.
+    """
+    import resource
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"pratiche.{formato}")
+        t0 = time.perf_counter()
+        righe = esporta_collection(CollectionSintetica(n), path, formato=formato, page_size=page_size)
+        durata = time.perf_counter() - t0
+        dimensione = os.path.getsize(path)
+
+    picco_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"📊 {righe:,} pratiche sintetiche → {formato} (collection sintetica, senza rete): {durata:.2f}s, "
+          f"{righe / durata:,.0f} righe/s, file {dimensione / 1e6:.1f} MB, picco RSS {picco_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export in streaming delle pratiche Conto Termico")
+    parser.add_argument("destinazione", nargs="?", help="File di output (.csv, .jsonl, .parquet)")
+    parser.add_argument("--collection", default="Pratiche")
+    parser.add_argument("--proprieta", nargs="+", help="Proprietà da esportare (default: campi del report)")
+    parser.add_argument("--formato", choices=list(WRITERS))
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--tenant", nargs="+", help="Esporta questi tenant in parallelo")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Throughput dell'export su una collection sintetica di N pratiche")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.formato or "csv", args.page_size)
+    elif not args.destinazione:
+        parser.error("specificare il file di destinazione oppure --benchmark N")
+    else:
+        from import_data import get_client
+
+        client = get_client()
+        try:
+            t0 = time.perf_counter()
+            righe = esporta(client, args.destinazione, args.collection, args.proprieta,
+                            args.formato, args.page_size, args.tenant, args.workers)
+            durata = time.perf_counter() - t0
+            print(f"✅ Esportate {righe:,} righe in {durata:.2f}s ({righe / durata if durata else 0:,.0f} righe/s)")
+        finally:
+            client.close()
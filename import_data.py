@@ -6,21 +6,15 @@ per la demo del Conto Termico GSE.
 
 Esegui UNA VOLTA prima di avviare l'applicazione:
     python import_data.py
+
+Importare il modulo non apre connessioni né legge credenziali: i dataset
+(NORMATIVE, PRATICHE, IMPIANTI) sono disponibili offline. Configurazione e
+client Weaviate sono creati solo da carica_configurazione() e get_client().
 """
 
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.config import Configure, Property, DataType
 import os
-import json
-from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
-
-WCD_URL = os.environ["WCD_URL"]
-WCD_API_KEY = os.environ["WCD_API_KEY"]
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+import time
+from functools import lru_cache
 
 # ─────────────────────────────────────────
 # DATI FITTIZI — NORMATIVE GSE
@@ -316,27 +310,69 @@ IMPIANTI = [
     }
 ]
 
+COLLECTION_DATA = {
+    "Normative": NORMATIVE,
+    "Pratiche": PRATICHE,
+    "Impianti": IMPIANTI,
+}
+
+# Proprietà vettorizzate (text2vec_openai) per ciascuna collection
+SOURCE_PROPERTIES = {
+    "Normative": ["titolo", "testo"],
+    "Pratiche": ["tipo_intervento", "note", "tipo_soggetto"],
+    "Impianti": ["modello", "tipo", "adatto_per", "note_tecniche"],
+}
+
+# Campo univoco da cui derivare un UUID deterministico (reimportare = aggiornare)
+CHIAVI_UUID = {
+    "Normative": "codice",
+    "Pratiche": "codice_pratica",
+    "Impianti": "modello",
+}
+
 # ─────────────────────────────────────────
 # FUNZIONI DI IMPORTAZIONE
 # ─────────────────────────────────────────
 
+@lru_cache(maxsize=1)
+def carica_configurazione() -> dict:
+    """Legge le credenziali da .env e dalle variabili d'ambiente (al primo uso)."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return {
+        "wcd_url": os.environ["WCD_URL"],
+        "wcd_api_key": os.environ["WCD_API_KEY"],
+        "openai_api_key": os.environ.get("OPENAI_API_KEY", ""),
+    }
+
+
 def get_client():
     """Connette a Weaviate Cloud."""
+    import weaviate
+    from weaviate.classes.init import Auth
+
+    config = carica_configurazione()
     headers = {}
-    if OPENAI_API_KEY:
-        headers["X-OpenAI-Api-Key"] = OPENAI_API_KEY
+    if config["openai_api_key"]:
+        headers["X-OpenAI-Api-Key"] = config["openai_api_key"]
 
     client = weaviate.connect_to_weaviate_cloud(
-        cluster_url=WCD_URL,
-        auth_credentials=Auth.api_key(WCD_API_KEY),
+        cluster_url=config["wcd_url"],
+        auth_credentials=Auth.api_key(config["wcd_api_key"]),
         headers=headers if headers else None
     )
     print(f"✅ Connesso a Weaviate: {client.is_ready()}")
     return client
 
 
-def create_collections(client):
-    """Crea le collection se non esistono."""
+def create_collections(client, openai_base_url: str = None):
+    """
+    Crea le collection se non esistono.
+    `openai_base_url` indirizza il vectorizer a un endpoint compatibile OpenAI (es. lo stub di carico.py).
+    """
+    from weaviate.classes.config import Configure, Property, DataType
+    from embedding_cache import DEFAULT_MODEL
 
     # --- Collection: Normative ---
     if not client.collections.exists("Normative"):
@@ -345,7 +381,9 @@ def create_collections(client):
             vector_config=[
                 Configure.Vectors.text2vec_openai(
                     name="default",
-                    source_properties=["titolo", "testo"],
+                    model=DEFAULT_MODEL,
+                    source_properties=SOURCE_PROPERTIES["Normative"],
+                    base_url=openai_base_url,
                 )
             ],
             properties=[
@@ -370,7 +408,9 @@ def create_collections(client):
             vector_config=[
                 Configure.Vectors.text2vec_openai(
                     name="default",
-                    source_properties=["tipo_intervento", "note", "tipo_soggetto"],
+                    model=DEFAULT_MODEL,
+                    source_properties=SOURCE_PROPERTIES["Pratiche"],
+                    base_url=openai_base_url,
                 )
             ],
             properties=[
@@ -388,6 +428,9 @@ def create_collections(client):
                 Property(name="incentivo_totale_stimato", data_type=DataType.NUMBER),
                 Property(name="documenti_presenti", data_type=DataType.TEXT_ARRAY),
                 Property(name="documenti_mancanti", data_type=DataType.TEXT_ARRAY),
+                Property(name="documenti_presenti_mask", data_type=DataType.INT),
+                Property(name="documenti_mancanti_ids", data_type=DataType.INT_ARRAY),
+                Property(name="documenti_mancanti_manuali", data_type=DataType.TEXT_ARRAY),
                 Property(name="note", data_type=DataType.TEXT),
                 Property(name="tecnico_responsabile", data_type=DataType.TEXT),
                 Property(name="marca_modello", data_type=DataType.TEXT),
@@ -405,23 +448,28 @@ def create_collections(client):
             vector_config=[
                 Configure.Vectors.text2vec_openai(
                     name="default",
-                    source_properties=["modello", "tipo", "adatto_per", "note_tecniche"],
+                    model=DEFAULT_MODEL,
+                    source_properties=SOURCE_PROPERTIES["Impianti"],
+                    base_url=openai_base_url,
                 )
             ],
             properties=[
                 Property(name="modello", data_type=DataType.TEXT),
                 Property(name="tipo", data_type=DataType.TEXT),
                 Property(name="marca", data_type=DataType.TEXT),
-                Property(name="potenza_kw", data_type=DataType.NUMBER),
-                Property(name="cop_a7w35", data_type=DataType.NUMBER),
+                Property(name="potenza_kw", data_type=DataType.NUMBER, index_range_filters=True),
+                Property(name="cop_a7w35", data_type=DataType.NUMBER, index_range_filters=True),
                 Property(name="scop_zona_e", data_type=DataType.NUMBER),
                 Property(name="classe_energetica", data_type=DataType.TEXT),
                 Property(name="certificazioni", data_type=DataType.TEXT_ARRAY),
-                Property(name="prezzo_indicativo_eur", data_type=DataType.NUMBER),
+                Property(name="prezzo_indicativo_eur", data_type=DataType.NUMBER, index_range_filters=True),
+                Property(name="prezzo_indicativo_eur_mq", data_type=DataType.NUMBER),
                 Property(name="adatto_per", data_type=DataType.TEXT),
                 Property(name="note_tecniche", data_type=DataType.TEXT),
                 Property(name="ammissibile_ct", data_type=DataType.BOOL),
                 Property(name="motivazione_ammissibilita", data_type=DataType.TEXT),
+                Property(name="zone_ammissibili", data_type=DataType.TEXT_ARRAY),
+                Property(name="incentivo_su_prezzo", data_type=DataType.NUMBER),
             ]
         )
         print("✅ Collection 'Impianti' creata")
@@ -429,32 +477,73 @@ def create_collections(client):
         print("ℹ️  Collection 'Impianti' già esiste")
 
 
-def import_all_data(client):
-    """Importa tutti i dati nelle collection."""
-
-    # --- Normative ---
-    normative_coll = client.collections.get("Normative")
-    with normative_coll.batch.fixed_size(batch_size=10) as batch:
-        for item in NORMATIVE:
-            batch.add_object(item)
-    print(f"✅ Importate {len(NORMATIVE)} normative")
+def testo_da_vettorizzare(nome: str, item: dict, proprieta: list[str]) -> str:
+    """Testo inviato all'embedding: nome collection + proprietà vettorizzate."""
+    parti = [nome.lower()] + [str(item[p]) for p in proprieta if item.get(p)]
+    return " ".join(parti)
+
+
+def calcola_vettori(embedder, cache) -> dict:
+    """
+    Calcola (o legge dalla cache) i vettori di tutti gli oggetti da importare.
+    Restituisce {nome_collection: [vettore, ...]} nello stesso ordine dei dati.
+    """
+    from embedding_cache import embed_con_cache
+
+    vettori = {}
+    for nome, dati in COLLECTION_DATA.items():
+        testi = [testo_da_vettorizzare(nome, item, SOURCE_PROPERTIES[nome]) for item in dati]
+        vettori[nome] = embed_con_cache(testi, cache, embedder)
+    return vettori
+
+
+def import_all_data(client, embedder=None, cache=None):
+    """
+    Importa tutti i dati nelle collection.
+
+    Se vengono passati `embedder` e `cache`, gli oggetti sono caricati con i
+    vettori precalcolati e Weaviate non richiama l'API di embedding.
+    """
+    from weaviate.util import generate_uuid5
+    from documenti import completezza, non_riconosciuti
+    from ricalcola_ammissibilita import proprieta_derivate
+
+    vettori = calcola_vettori(embedder, cache) if embedder is not None else {}
+
+    for nome, dati in COLLECTION_DATA.items():
+        coll = client.collections.get(nome)
+        with coll.batch.fixed_size(batch_size=10) as batch:
+            for i, item in enumerate(dati):
+                # Rimuovi None per evitare errori Weaviate
+                clean_item = {k: v for k, v in item.items() if v is not None}
+                if nome == "Pratiche":
+                    # Documenti mancanti derivati dalla checklist (vedi documenti.py)
+                    clean_item.update(completezza(item))
+                    sconosciuti = non_riconosciuti(item)
+                    if sconosciuti:
+                        print(f"  ⚠️  {item['codice_pratica']}: documenti non riconosciuti {sconosciuti}")
+                elif nome == "Impianti":
+                    # Zone ammissibili e incentivo/prezzo per i filtri e l'ordinamento lato server
+                    clean_item.update(proprieta_derivate(item))
+                vettore = vettori[nome][i] if nome in vettori else None
+                batch.add_object(
+                    properties=clean_item,
+                    uuid=generate_uuid5(item[CHIAVI_UUID[nome]], nome),
+                    vector={"default": vettore} if vettore is not None else None,
+                )
+        if nome == "Impianti":
+            print(f"✅ Importati {len(dati)} impianti")
+        else:
+            print(f"✅ Importate {len(dati)} {nome.lower()}")
 
-    # --- Pratiche ---
-    pratiche_coll = client.collections.get("Pratiche")
-    with pratiche_coll.batch.fixed_size(batch_size=10) as batch:
-        for item in PRATICHE:
-            # Rimuovi None per evitare errori Weaviate
-            clean_item = {k: v for k, v in item.items() if v is not None}
-            batch.add_object(clean_item)
-    print(f"✅ Importate {len(PRATICHE)} pratiche")
 
-    # --- Impianti ---
-    impianti_coll = client.collections.get("Impianti")
-    with impianti_coll.batch.fixed_size(batch_size=10) as batch:
-        for item in IMPIANTI:
-            clean_item = {k: v for k, v in item.items() if v is not None}
-            batch.add_object(clean_item)
-    print(f"✅ Importati {len(IMPIANTI)} impianti")
+def crea_embedder_con_cache():
+    """Embedder OpenAI + cache locale, se è disponibile la API key."""
+    openai_api_key = carica_configurazione()["openai_api_key"]
+    if not openai_api_key or os.getenv("EMBEDDING_CACHE", "1") == "0":
+        return None, None
+    from embedding_cache import EmbeddingCache, OpenAIEmbedder
+    return OpenAIEmbedder(openai_api_key), EmbeddingCache()
 
 
 def verify_import(client):
@@ -467,14 +556,20 @@ def verify_import(client):
 
 if __name__ == "__main__":
     print("\n🚀 Avvio importazione dati Conto Termico GSE...\n")
+    t_inizio = time.perf_counter()
     client = get_client()
     try:
         print("\n📂 Creazione collection...")
         create_collections(client)
         print("\n📥 Importazione dati...")
-        import_all_data(client)
+        embedder, cache = crea_embedder_con_cache()
+        import_all_data(client, embedder, cache)
+        if embedder is not None:
+            print(f"🧠 Chiamate API di embedding: {embedder.calls} (cache: {len(cache)} vettori)")
+            cache.close()
         print("\n✅ Verifica importazione:")
         verify_import(client)
+        print(f"\n⏱️  Tempo totale: {time.perf_counter() - t_inizio:.2f}s")
         print("\n🎉 Importazione completata! Ora puoi avviare Elysia con:")
         print("   python main.py\n")
     finally:
@@ -6,15 +6,15 @@ Applicazione Conto Termico GSE - Powered by Elysia
 
 import os
 import subprocess
-from dotenv import load_dotenv
-
-load_dotenv()
 
 
 def setup_elysia():
     """Configura Elysia e importa i dati."""
+    from dotenv import load_dotenv
     from elysia import configure, Tree
 
+    load_dotenv()
+
     openai_key = os.getenv("OPENAI_API_KEY")
     gemini_key = os.getenv("GEMINI_API_KEY")
 
@@ -46,8 +46,12 @@ def setup_elysia():
     subprocess.run(["python", "import_data.py"], check=False)
     print("✅ Dati importati")
 
+    # Preprocessing Elysia delle sole collection cambiate dall'ultimo deploy
+    from preprocessing import assicura_preprocessing
+    print("🧠 Preprocessing collection...")
+    assicura_preprocessing()
+
     # Inizializzazione Tree
-    # NOTA: il preprocessing si fa dall'interfaccia web cliccando "Analyze"
     tree = Tree(
         agent_description=(
             "Sei un esperto assistente specializzato nella gestione del "
@@ -74,6 +78,9 @@ def setup_elysia():
     tree = register_tools(tree)
     print("✅ Tool personalizzati registrati")
 
+    from zone_climatiche import tabella
+    print(f"✅ Tabella zone climatiche caricata: {len(tabella())} comuni")
+
     return tree
 
 
@@ -83,7 +90,8 @@ def run_web_mode(port: int = 8000):
     print("⚙️  Inizializzazione in corso...")
     setup_elysia()
     print("🚀 Avvio server Elysia...")
-    subprocess.run(["elysia", "start", "--port", str(port)])
+    # Stesso entry point del Dockerfile: l'API Elysia con i tool personalizzati
+    subprocess.run(["uvicorn", "servizio:crea_app", "--factory", "--host", "0.0.0.0", "--port", str(port)])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+"""
+preprocessing.py
+================
+Preprocessing Elysia delle collection eseguito all'avvio (al posto di
+"Analyze" nella web app).
+
+Il preprocessing (riassunto LLM di ogni collection) viene ripetuto solo per
+le collection cambiate. L'impronta di una collection è l'hash dello schema e
+di tutti gli oggetti (uuid + proprietà); impronta e durata dell'ultimo
+preprocessing sono salvate su Weaviate, quindi sopravvivono ai nuovi deploy.
+Le collection da ricalcolare sono elaborate in parallelo.
+
+Uso:
+    python preprocessing.py --stato   # quali collection andrebbero ricalcolate
+"""
+
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+COLLECTION_PREPROCESSING = ["Normative", "Pratiche", "Impianti"]
+
+# Il prefisso ELYSIA_ la tiene fuori dall'elenco dei dati nella web app
+COLLECTION_CACHE = "ELYSIA_CT_PREPROCESSING_CACHE__"
+
+
+def impronta(client, nome: str) -> str:
+    """Hash di schema e contenuto della collection (l'iteratore restituisce gli oggetti in ordine di uuid)."""
+    coll = client.collections.get(nome)
+    h = hashlib.sha256()
+    schema = sorted((p.name, str(p.data_type)) for p in coll.config.get().properties)
+    h.update(json.dumps(schema).encode("utf-8"))
+    for obj in coll.iterator(cache_size=1000):
+        h.update(str(obj.uuid).encode("ascii"))
+        h.update(json.dumps(obj.properties, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _collection_cache(client):
+    from weaviate.classes.config import Configure, DataType, Property
+
+    if not client.collections.exists(COLLECTION_CACHE):
+        client.collections.create(
+            name=COLLECTION_CACHE,
+            vector_config=Configure.Vectors.self_provided(),
+            properties=[
+                Property(name="collection", data_type=DataType.TEXT),
+                Property(name="impronta", data_type=DataType.TEXT),
+                Property(name="durata_s", data_type=DataType.NUMBER),
+                Property(name="aggiornato", data_type=DataType.TEXT),
+            ],
+        )
+    return client.collections.get(COLLECTION_CACHE)
+
+
+def leggi_cache(client) -> dict:
+    """{collection: {"impronta", "durata_s", "aggiornato"}} dell'ultimo preprocessing."""
+    if not client.collections.exists(COLLECTION_CACHE):
+        return {}
+    return {
+        obj.properties["collection"]: obj.properties
+        for obj in client.collections.get(COLLECTION_CACHE).iterator()
+    }
+
+
+def salva_cache(client, nome: str, impronta_collection: str, durata_s: float):
+    from weaviate.util import generate_uuid5
+
+    coll = _collection_cache(client)
+    uuid = generate_uuid5(nome)
+    proprieta = {
+        "collection": nome,
+        "impronta": impronta_collection,
+        "durata_s": durata_s,
+        "aggiornato": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    if coll.data.exists(uuid):
+        coll.data.replace(uuid=uuid, properties=proprieta)
+    else:
+        coll.data.insert(properties=proprieta, uuid=uuid)
+
+
+def da_ricalcolare(client, collezioni=COLLECTION_PREPROCESSING, forza: bool = False):
+    """(collection da ricalcolare, impronte attuali, cache)."""
+    from elysia import preprocessed_collection_exists
+
+    cache = leggi_cache(client)
+    with ThreadPoolExecutor(max_workers=len(collezioni)) as pool:
+        impronte = dict(zip(collezioni, pool.map(lambda n: impronta(client, n), collezioni)))
+    cambiate = [
+        nome for nome in collezioni
+        if forza
+        or cache.get(nome, {}).get("impronta") != impronte[nome]
+        or not preprocessed_collection_exists(nome)
+    ]
+    return cambiate, impronte, cache
+
+
+def _preprocessa(nome: str) -> float:
+    from elysia import preprocess
+
+    t0 = time.perf_counter()
+    preprocess(collection_names=[nome], force=True)
+    return time.perf_counter() - t0
+
+
+def assicura_preprocessing(collezioni=COLLECTION_PREPROCESSING, forza: bool = False):
+    """
+    Esegue il preprocessing Elysia delle sole collection cambiate, in parallelo.
+    Richiede Elysia già configurato (configure()). Restituisce il tempo risparmiato in secondi.
+    Non blocca l'avvio: qualunque errore (connessione, impronte, Elysia) è
+    segnalato nel log e la funzione restituisce 0.
+    """
+    try:
+        return _assicura_preprocessing(collezioni, forza)
+    except Exception as e:
+        print(f"  ⚠️  Preprocessing non eseguito ({type(e).__name__}: {e}); "
+              f"l'app parte comunque, riprovare con 'Analyze' nella web app")
+        return 0.0
+
+
+def _assicura_preprocessing(collezioni, forza: bool):
+    from import_data import get_client
+
+    client = get_client()
+    try:
+        cambiate, impronte, cache = da_ricalcolare(client, collezioni, forza)
+        invariate = [nome for nome in collezioni if nome not in cambiate]
+        for nome in invariate:
+            print(f"  ♻️  {nome}: invariata, preprocessing in cache ({cache[nome]['aggiornato']})")
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, len(cambiate))) as pool:
+            futures = {nome: pool.submit(_preprocessa, nome) for nome in cambiate}
+        for nome, future in futures.items():
+            try:
+                durata = future.result()
+            except Exception as e:
+                print(f"  ⚠️  {nome}: preprocessing non riuscito ({e}); riprovare con 'Analyze' nella web app")
+                continue
+            salva_cache(client, nome, impronte[nome], durata)
+            print(f"  🔄 {nome}: preprocessing eseguito in {durata:.1f}s")
+
+        risparmiato = sum(cache[nome]["durata_s"] for nome in invariate)
+        print(f"⏱️  Preprocessing: {len(cambiate)} collection ricalcolate in {time.perf_counter() - t0:.1f}s, "
+              f"{len(invariate)} dalla cache (risparmiati ~{risparmiato:.0f}s)")
+        return risparmiato
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--stato" in sys.argv:
+        from import_data import get_client
+
+        client = get_client()
+        try:
+            cambiate, _, cache = da_ricalcolare(client)
+            for nome in COLLECTION_PREPROCESSING:
+                voce = cache.get(nome)
+                dettaglio = f"ultimo {voce['aggiornato']}, {voce['durata_s']:.0f}s" if voce else "mai eseguito"
+                print(f"  {'🔄 da ricalcolare' if nome in cambiate else '♻️  in cache':<18} {nome:<10} ({dettaglio})")
+        finally:
+            client.close()
+    else:
+        print("Uso: python preprocessing.py --stato")
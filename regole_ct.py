@@ -0,0 +1,302 @@
+"""
+regole_ct.py
+============
+Regole di ammissibilità, tariffe incentivo e checklist documentale del Conto Termico GSE.
+
+Funzioni pure (senza dipendenze da Elysia o Weaviate) usate dai tool in
+tools.py e dai job batch sul catalogo Impianti.
+"""
+
+# Soglie minime COP per zona climatica (pompe di calore)
+SOGLIE_COP = {
+    "A": 2.6, "B": 2.6,
+    "C": 2.8, "D": 2.8,
+    "E": 3.0, "F": 3.0
+}
+
+ZONE_CLIMATICHE = list(SOGLIE_COP)
+
+
+def _e_scaldacqua(tipo_lower: str) -> bool:
+    """
+    Scaldacqua a pompa di calore (B.3). Va controllato prima di B.2: anche il suo
+    nome contiene "pompa di calore". "ACS" da solo non basta: una pompa di calore
+    con ACS integrata resta B.2.
+    """
+    e_pompa_di_calore = "pompa di calore" in tipo_lower or "heat pump" in tipo_lower
+    return "scaldacqua" in tipo_lower or ("acs" in tipo_lower and not e_pompa_di_calore)
+
+
+def valuta_ammissibilita(
+    tipo_impianto: str,
+    potenza_kw: float = None,
+    cop_certificato: float = None,
+    zona_climatica: str = None,
+    superficie_mq: float = None,
+    certificazioni: list[str] = None,
+) -> dict:
+    """
+    Applica le regole CT 2.0 a un impianto e restituisce il dizionario dei
+    risultati (ammissibile, motivazione, requisiti mancanti, raccomandazioni).
+    """
+
+    risultati = {
+        "tipo_impianto": tipo_impianto,
+        "ammissibile": None,
+        "motivazione": "",
+        "requisiti_mancanti": [],
+        "raccomandazioni": []
+    }
+
+    tipo_lower = tipo_impianto.lower()
+
+    # --- Scaldacqua pompa di calore (prima di B.2, vedi _e_scaldacqua) ---
+    e_pompa_di_calore = "pompa di calore" in tipo_lower or "heat pump" in tipo_lower
+    if _e_scaldacqua(tipo_lower):
+        tipo_intervento = "B.3 - Scaldacqua a pompa di calore"
+        risultati["tipo_intervento_ct"] = tipo_intervento
+        risultati["durata_incentivo"] = "2 anni"
+        risultati["ammissibile"] = True
+        risultati["motivazione"] = "Scaldacqua a pompa di calore ammissibile (tipologia B.3)."
+
+    # --- Pompa di calore ---
+    elif e_pompa_di_calore:
+        tipo_intervento = "B.2 - Pompe di calore per climatizzazione invernale"
+        risultati["tipo_intervento_ct"] = tipo_intervento
+        risultati["durata_incentivo"] = "5 anni"
+
+        problemi = []
+
+        if cop_certificato and zona_climatica:
+            soglia = SOGLIE_COP.get(zona_climatica.upper(), 2.8)
+            if cop_certificato >= soglia:
+                risultati["ammissibile"] = True
+                risultati["motivazione"] = f"COP {cop_certificato} ≥ soglia minima {soglia} per zona {zona_climatica}. ✅"
+            else:
+                problemi.append(f"COP {cop_certificato} < soglia minima {soglia} per zona {zona_climatica}")
+        elif cop_certificato and not zona_climatica:
+            risultati["raccomandazioni"].append("Specifica la zona climatica per una verifica precisa del COP minimo")
+
+        if potenza_kw and potenza_kw > 2000:
+            problemi.append(f"Potenza {potenza_kw} kW supera il limite massimo di 2.000 kW")
+
+        if certificazioni:
+            cert_lower = [c.lower() for c in certificazioni]
+            if not any("ehpa" in c or "en 14511" in c for c in cert_lower):
+                risultati["requisiti_mancanti"].append("Certificazione EHPA o test EN 14511 richiesta")
+        else:
+            risultati["requisiti_mancanti"].append("Verificare presenza certificazione EHPA o EN 14511")
+
+        if problemi:
+            risultati["ammissibile"] = False
+            risultati["motivazione"] = "Non ammissibile: " + "; ".join(problemi)
+
+        if risultati["ammissibile"] is None:
+            risultati["ammissibile"] = True
+            risultati["motivazione"] = "Tipo impianto compatibile con CT 2.0. Verificare COP e certificazioni."
+
+    # --- Solare termico ---
+    elif "solare" in tipo_lower:
+        tipo_intervento = "B.4 - Collettori solari termici"
+        risultati["tipo_intervento_ct"] = tipo_intervento
+        risultati["durata_incentivo"] = "5 anni"
+
+        if superficie_mq and superficie_mq < 1.5:
+            risultati["ammissibile"] = False
+            risultati["motivazione"] = f"Superficie {superficie_mq} m² < minimo 1,5 m² richiesto"
+        else:
+            risultati["ammissibile"] = True
+            risultati["motivazione"] = "Solare termico ammissibile. Verificare certificazione Solar Keymark."
+
+        if certificazioni:
+            if not any("solar keymark" in c.lower() for c in certificazioni):
+                risultati["requisiti_mancanti"].append("Certificazione Solar Keymark richiesta")
+        else:
+            risultati["requisiti_mancanti"].append("Verificare presenza certificazione Solar Keymark o equivalente europea")
+
+    # --- Caldaia biomassa ---
+    elif "biomassa" in tipo_lower or "pellet" in tipo_lower or "legna" in tipo_lower:
+        tipo_intervento = "B.5 - Generatori di calore a biomassa"
+        risultati["tipo_intervento_ct"] = tipo_intervento
+        risultati["durata_incentivo"] = "5 anni"
+        risultati["ammissibile"] = True
+        risultati["motivazione"] = "Caldaia a biomassa ammissibile (tipologia B.5). Verificare certificazione emissioni EN 303-5."
+        if not certificazioni or not any("303-5" in c for c in certificazioni):
+            risultati["requisiti_mancanti"].append("Certificato emissioni EN 303-5 obbligatorio")
+
+    # --- Caldaia a gas non condensante ---
+    elif "gas" in tipo_lower and "condensaz" not in tipo_lower:
+        risultati["ammissibile"] = False
+        risultati["motivazione"] = "❌ Le caldaie a gas NON a condensazione non rientrano negli interventi del Conto Termico 2.0."
+
+    # --- Caldaia a condensazione ---
+    elif "condensaz" in tipo_lower:
+        tipo_intervento = "B.1 - Sostituzione con caldaie a condensazione"
+        risultati["tipo_intervento_ct"] = tipo_intervento
+        risultati["durata_incentivo"] = "2 anni"
+        risultati["ammissibile"] = True
+        risultati["motivazione"] = "Caldaia a condensazione ammissibile (tipologia B.1). Durata incentivo: 2 anni."
+
+    else:
+        risultati["ammissibile"] = None
+        risultati["motivazione"] = f"Tipo impianto '{tipo_impianto}' non riconosciuto. Consultare il DM 16/02/2016 per la classificazione corretta."
+
+    return risultati
+
+
+# Tariffe incentivo (€/anno per kW o m²) - dati semplificati da DM 16/02/2016
+# In produzione queste tariffe andrebbero lette dalla collection Normative
+TARIFFE = {
+    # Prima di "pompa di calore": anche questa chiave la contiene
+    "scaldacqua pompa di calore": {
+        "incentivo_fisso_anno": 300,  # € fissi/anno indicativo
+        "durata_anni": 2,
+    },
+    "pompa di calore": {
+        "tariffa_base_kwh": 110,   # €/kW/anno indicativo
+        "durata_anni": 5,
+        "min_kw": 5, "max_kw": 2000
+    },
+    "solare termico": {
+        "tariffa_base_mq": 245,    # €/m²/anno indicativo
+        "durata_anni": 5,
+        "min_mq": 1.5
+    },
+    "biomassa": {
+        "tariffa_base_kwh": 95,    # €/kW/anno indicativo
+        "durata_anni": 5,
+        "min_kw": 5, "max_kw": 2000
+    },
+    "caldaia condensazione": {
+        "tariffa_base_kwh": 65,    # €/kW/anno indicativo
+        "durata_anni": 2,
+        "min_kw": 5
+    }
+}
+
+
+def calcola_incentivo(
+    tipo_intervento: str,
+    potenza_kw: float = None,
+    superficie_mq: float = None,
+    tipo_soggetto: str = "privato",
+) -> dict | None:
+    """
+    Stima l'incentivo annuo e totale secondo le tariffe semplificate.
+    Restituisce None se il tipo di intervento non è riconosciuto.
+    """
+    tipo_lower = tipo_intervento.lower()
+    risultato = {"tipo_intervento": tipo_intervento}
+
+    # Moltiplicatore PA (PA ha incentivi leggermente più alti)
+    moltiplicatore_pa = 1.15 if tipo_soggetto.lower() == "pa" else 1.0
+
+    for chiave, dati in TARIFFE.items():
+        if chiave in tipo_lower:
+            durata = dati["durata_anni"]
+
+            if chiave == "solare termico" and superficie_mq:
+                annuo = dati["tariffa_base_mq"] * superficie_mq * moltiplicatore_pa
+                risultato["incentivo_annuo_eur"] = round(annuo, 2)
+                risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
+                risultato["durata_anni"] = durata
+                risultato["base_calcolo"] = f"{superficie_mq} m² × {dati['tariffa_base_mq']} €/m²/anno"
+
+            elif chiave == "scaldacqua pompa di calore":
+                annuo = dati["incentivo_fisso_anno"] * moltiplicatore_pa
+                risultato["incentivo_annuo_eur"] = round(annuo, 2)
+                risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
+                risultato["durata_anni"] = durata
+                risultato["base_calcolo"] = "Incentivo fisso per categoria B.3"
+
+            elif potenza_kw:
+                annuo = dati["tariffa_base_kwh"] * potenza_kw * moltiplicatore_pa
+                risultato["incentivo_annuo_eur"] = round(annuo, 2)
+                risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
+                risultato["durata_anni"] = durata
+                risultato["base_calcolo"] = f"{potenza_kw} kW × {dati['tariffa_base_kwh']} €/kW/anno"
+
+            else:
+                risultato["nota"] = f"Specificare la potenza in kW (o i m² per solare termico) per ottenere una stima precisa."
+                risultato["formula"] = f"Incentivo annuo ≈ {dati.get('tariffa_base_kwh', dati.get('tariffa_base_mq'))} × [kW o m²] per {durata} anni"
+
+            risultato["avvertenza"] = "⚠️ Stima indicativa. Il valore definitivo è calcolato dal GSE in sede di istruttoria."
+            return risultato
+
+    return None
+
+
+# Sezioni della checklist documentale, nell'ordine in cui sono presentate
+SEZIONI_CHECKLIST = ["documenti_base", "documenti_specifici", "documenti_pa", "documenti_prenotazione"]
+
+
+def genera_checklist(tipo_intervento: str, tipo_soggetto: str = "privato", tipo_accesso: str = "diretto") -> dict:
+    """
+    Documenti richiesti per una domanda CT, divisi per sezione
+    (base, specifici per intervento, PA, prenotazione).
+    """
+    # Documenti base (tutti gli interventi)
+    documenti_base = [
+        {"doc": "Relazione tecnica descrittiva", "obbligatorio": True, "note": "Firmata da tecnico abilitato (ingegnere, perito, geometra)"},
+        {"doc": "Documentazione fotografica ante-operam", "obbligatorio": True, "note": "Foto del vecchio impianto prima della sostituzione"},
+        {"doc": "Documentazione fotografica post-operam", "obbligatorio": True, "note": "Foto del nuovo impianto installato"},
+        {"doc": "Fatture/ricevute pagamento tracciabili", "obbligatorio": True, "note": "No contanti. Bonifico, carta o altro mezzo tracciabile"},
+        {"doc": "Schede tecniche componenti (con marcatura CE)", "obbligatorio": True, "note": "Del produttore, in italiano o con traduzione"},
+        {"doc": "Dichiarazione di conformità impianto", "obbligatorio": True, "note": "Modello CPI per impianti termici o dichiarazione D.M. 37/2008"},
+    ]
+
+    # Documenti specifici per tipo impianto
+    documenti_specifici = []
+
+    tipo_lower = tipo_intervento.lower()
+
+    if _e_scaldacqua(tipo_lower):
+        # B.3: bastano i documenti base (nessun test EN 14511 né dismissione del generatore)
+        documenti_specifici = []
+
+    elif "pompa di calore" in tipo_lower:
+        documenti_specifici = [
+            {"doc": "Certificato test EN 14511 o EHPA Gold", "obbligatorio": True, "note": "Attestante COP ≥ soglia minima per la zona climatica"},
+            {"doc": "Documentazione dismissione vecchio generatore", "obbligatorio": True, "note": "Foto + dichiarazione tecnico dello smaltimento"},
+        ]
+
+    elif "solare" in tipo_lower:
+        documenti_specifici = [
+            {"doc": "Certificazione Solar Keymark", "obbligatorio": True, "note": "O certificazione europea equivalente EN 12975"},
+            {"doc": "Schema dell'impianto idraulico", "obbligatorio": True, "note": "Planimetria con posizionamento collettori"},
+        ]
+
+    elif "biomassa" in tipo_lower or "pellet" in tipo_lower:
+        documenti_specifici = [
+            {"doc": "Certificato emissioni EN 303-5", "obbligatorio": True, "note": "Classe 5 (5 stelle) obbligatoria per nuove installazioni"},
+            {"doc": "Analisi combustibile (se non pellet certificato)", "obbligatorio": False, "note": "Per biomassa non certificata"},
+        ]
+
+    # Documenti aggiuntivi per PA
+    documenti_pa = []
+    if tipo_soggetto.lower() == "pa":
+        documenti_pa = [
+            {"doc": "APE pre-intervento", "obbligatorio": True, "note": "Attestato Prestazione Energetica prima dei lavori"},
+            {"doc": "APE post-intervento", "obbligatorio": True, "note": "Attestato Prestazione Energetica dopo i lavori"},
+            {"doc": "Delibera/determinazione di affidamento lavori", "obbligatorio": True, "note": "Atto amministrativo di approvazione dell'intervento"},
+        ]
+
+    # Documenti per procedura a prenotazione
+    documenti_prenotazione = []
+    if tipo_accesso.lower() == "prenotazione":
+        documenti_prenotazione = [
+            {"doc": "Domanda di prenotazione preventiva", "obbligatorio": True, "note": "Da inviare PRIMA dell'avvio lavori"},
+            {"doc": "Preventivo dettagliato lavori", "obbligatorio": True, "note": "Con stima dell'incentivo annuo atteso"},
+        ]
+
+    return {
+        "tipo_intervento": tipo_intervento,
+        "tipo_soggetto": tipo_soggetto,
+        "procedura": tipo_accesso,
+        "documenti_base": documenti_base,
+        "documenti_specifici": documenti_specifici,
+        "documenti_pa": documenti_pa,
+        "documenti_prenotazione": documenti_prenotazione,
+        "totale_documenti": len(documenti_base) + len(documenti_specifici) + len(documenti_pa) + len(documenti_prenotazione),
+        "scadenza_invio": "Entro 60 giorni dalla data di fine lavori (accesso diretto)" if tipo_accesso == "diretto" else "Prenotazione PRIMA dei lavori, poi 12 mesi per completare"
+    }
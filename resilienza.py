@@ -0,0 +1,406 @@
+"""
+resilienza.py
+=============
+Controllo della latenza di coda per le letture Weaviate dei tool.
+
+- Deadline: ogni lettura ha un budget di tempo (WEAVIATE_DEADLINE_S, default 2 s).
+- Hedging: se la prima richiesta non risponde entro il p95 osservato,
+  parte una seconda richiesta identica e vince la prima che risponde.
+- Circuit breaker (uno per collection): dopo timeout o errori di connessione
+  consecutivi il backend non viene più interrogato per un intervallo; nel
+  frattempo si serve l'ultimo valore noto, marcato come non aggiornato. Alla
+  riapertura passa una sola richiesta di prova. Gli altri errori (query non
+  valida, proprietà assente, ...) sono bug e vengono rilanciati così come sono.
+
+Le letture devono essere cancellabili (client asincrono): una query sincrona
+in un thread continua a occuparlo anche dopo la deadline.
+
+Fault injection (backend simulato, nessuna connessione; confronta il backend
+asincrono con quello bloccante in un pool di thread). Termina con exit 1 se
+la configurazione in uso supera la deadline o lascia errori/richieste bloccate:
+    python resilienza.py --fault-injection
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from functools import lru_cache
+
+DEADLINE_S = float(os.getenv("WEAVIATE_DEADLINE_S", "2.0"))
+
+
+class BackendNonDisponibile(Exception):
+    """Il backend non ha risposto in tempo (o il circuito è aperto) e non c'è un valore di riserva."""
+
+
+@lru_cache(maxsize=1)
+def _eccezioni_weaviate() -> tuple:
+    """Eccezioni del client Weaviate che indicano un nodo lento o irraggiungibile."""
+    try:
+        from weaviate import exceptions
+    except ImportError:
+        return ()
+    nomi = ("WeaviateConnectionError", "WeaviateTimeoutError", "WeaviateGRPCUnavailableError")
+    return tuple(getattr(exceptions, nome) for nome in nomi if hasattr(exceptions, nome))
+
+
+def indisponibile(errore: BaseException) -> bool:
+    """True per timeout ed errori di connessione: solo questi contano per breaker e riserva."""
+    return isinstance(errore, (asyncio.TimeoutError, ConnectionError, OSError) + _eccezioni_weaviate())
+
+
+@dataclass
+class Lettura:
+    risultato: object
+    stantio: bool = False
+    eta_s: float = 0.0
+
+
+class LatencyTracker:
+    """Finestra mobile delle latenze osservate, per stimare il p95."""
+
+    def __init__(self, dimensione: int = 200, minimo_campioni: int = 20, default_s: float = 0.2):
+        self._campioni = deque(maxlen=dimensione)
+        self.minimo_campioni = minimo_campioni
+        self.default_s = default_s
+
+    def registra(self, secondi: float):
+        self._campioni.append(secondi)
+
+    def p95(self) -> float:
+        if len(self._campioni) < self.minimo_campioni:
+            return self.default_s
+        ordinati = sorted(self._campioni)
+        return ordinati[int(len(ordinati) * 0.95) - 1]
+
+
+class CircuitBreaker:
+    """
+    Chiuso → aperto dopo `soglia` fallimenti consecutivi; dopo `riapertura_s`
+    (semi-aperto) lascia passare una sola richiesta di prova: se riesce il
+    circuito si chiude, se fallisce resta aperto per un altro intervallo.
+    """
+
+    def __init__(self, soglia: int = 5, riapertura_s: float = 10.0):
+        self.soglia = soglia
+        self.riapertura_s = riapertura_s
+        self._fallimenti = 0
+        self._aperto_dal = None
+        self._prova_in_corso = False
+
+    def lascia_passare(self) -> bool:
+        """True se la richiesta può interrogare il backend (nel semi-aperto: solo la prova)."""
+        if self._aperto_dal is None:
+            return True
+        if self._prova_in_corso or time.monotonic() - self._aperto_dal < self.riapertura_s:
+            return False
+        self._prova_in_corso = True
+        return True
+
+    def successo(self):
+        self._fallimenti = 0
+        self._aperto_dal = None
+        self._prova_in_corso = False
+
+    def fallimento(self):
+        self._fallimenti += 1
+        if self._prova_in_corso or self._fallimenti >= self.soglia:
+            self._aperto_dal = time.monotonic()
+        self._prova_in_corso = False
+
+    def annulla(self):
+        """La richiesta autorizzata è stata cancellata senza esito: la prossima farà da prova."""
+        self._prova_in_corso = False
+
+
+class LetturaResiliente:
+    """Deadline + hedging + circuit breaker con ultimo valore noto come riserva."""
+
+    def __init__(self, deadline_s: float = DEADLINE_S, hedging: bool = True, soglia_breaker: int = 5,
+                 riapertura_s: float = 10.0, max_valori_riserva: int = 1024):
+        self.deadline_s = deadline_s
+        self.hedging = hedging
+        self.latenze = LatencyTracker()
+        self.soglia_breaker = soglia_breaker
+        self.riapertura_s = riapertura_s
+        self._breakers: dict = {}
+        self._riserva = OrderedDict()
+        self.max_valori_riserva = max_valori_riserva
+
+    def breaker(self, gruppo=None) -> CircuitBreaker:
+        """Circuit breaker del gruppo (la collection): un guasto su una non blocca le altre."""
+        breaker = self._breakers.get(gruppo)
+        if breaker is None:
+            breaker = self._breakers[gruppo] = CircuitBreaker(self.soglia_breaker, self.riapertura_s)
+        return breaker
+
+    def _salva_riserva(self, chiave, valore):
+        self._riserva[chiave] = (time.monotonic(), valore)
+        self._riserva.move_to_end(chiave)
+        while len(self._riserva) > self.max_valori_riserva:
+            self._riserva.popitem(last=False)
+
+    def _da_riserva(self, chiave, motivo: str) -> Lettura:
+        voce = self._riserva.get(chiave)
+        if voce is None:
+            raise BackendNonDisponibile(motivo)
+        salvato, valore = voce
+        return Lettura(valore, stantio=True, eta_s=time.monotonic() - salvato)
+
+    async def _con_hedging(self, funzione):
+        inizio = time.monotonic()
+        primo = asyncio.ensure_future(funzione())
+        tasks = {primo}
+        try:
+            if self.hedging:
+                attesa = min(self.latenze.p95(), self.deadline_s)
+                fatti, _ = await asyncio.wait(tasks, timeout=attesa)
+                if not fatti:
+                    tasks.add(asyncio.ensure_future(funzione()))
+
+            while tasks:
+                residuo = self.deadline_s - (time.monotonic() - inizio)
+                if residuo <= 0:
+                    raise asyncio.TimeoutError
+                fatti, tasks = await asyncio.wait(tasks, timeout=residuo, return_when=asyncio.FIRST_COMPLETED)
+                if not fatti:
+                    raise asyncio.TimeoutError
+                for task in fatti:
+                    if task.exception() is None:
+                        self.latenze.registra(time.monotonic() - inizio)
+                        return task.result()
+                # Le richieste completate sono fallite: rilancia se non resta nulla in volo
+                if not tasks:
+                    raise next(iter(fatti)).exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def leggi(self, chiave, funzione, gruppo=None) -> Lettura:
+        """
+        Esegue `funzione()` (coroutine factory) con deadline e hedging.
+        In caso di timeout, errore di connessione o circuito aperto (del `gruppo`)
+        restituisce l'ultimo valore noto per `chiave` (stantio=True), altrimenti
+        solleva BackendNonDisponibile. Gli altri errori sono rilanciati.
+        """
+        breaker = self.breaker(gruppo)
+        if not breaker.lascia_passare():
+            return self._da_riserva(chiave, "Weaviate non disponibile (circuito aperto)")
+
+        try:
+            valore = await self._con_hedging(funzione)
+        except asyncio.CancelledError:
+            breaker.annulla()
+            raise
+        except asyncio.TimeoutError:
+            breaker.fallimento()
+            return self._da_riserva(chiave, f"Weaviate non ha risposto entro {self.deadline_s:g}s")
+        except Exception as e:
+            if not indisponibile(e):
+                # Il backend ha risposto: la prova (se era tale) è riuscita, l'errore è della query
+                breaker.successo()
+                raise
+            breaker.fallimento()
+            return self._da_riserva(chiave, f"Weaviate non disponibile: {e}")
+
+        breaker.successo()
+        self._salva_riserva(chiave, valore)
+        return Lettura(valore)
+
+
+# Istanza condivisa dalle letture dei tool (vedi single_flight.fetch_objects_condiviso)
+LETTURE_WEAVIATE = LetturaResiliente()
+
+
+# ─────────────────────────────────────────
+# FAULT INJECTION
+# ─────────────────────────────────────────
+
+class BackendSimulato:
+    """
+    Stand-in locale di Weaviate: latenza normale ~20 ms; in modalità degradata
+    una frazione delle richieste resta bloccata per `stallo_s`; in modalità guasto fallisce.
+
+    Con `pool` la richiesta blocca un thread del pool (come una query del client
+    sincrono passata a to_thread) e la cancellazione non la interrompe; senza,
+    attende in modo cancellabile come il client asincrono.
+    """
+
+    def __init__(self, seed: int = 7, pool=None, stallo_s: float = 3.0):
+        self.rnd = random.Random(seed)
+        self.modalita = "normale"
+        self.chiamate = 0
+        self.pool = pool
+        self.stallo_s = stallo_s
+        self.thread_occupati = 0
+
+    def _attesa(self) -> float:
+        if self.modalita == "guasto":
+            return 0.005
+        if self.modalita == "degradato" and self.rnd.random() < 0.10:
+            return self.stallo_s
+        return self.rnd.uniform(0.010, 0.030)
+
+    def _risposta(self, chiave):
+        if self.modalita == "guasto":
+            raise ConnectionError("nodo Weaviate non raggiungibile")
+        return {"codice_pratica": chiave, "stato": "In istruttoria"}
+
+    def _fetch_bloccante(self, chiave, attesa: float):
+        self.thread_occupati += 1
+        try:
+            time.sleep(attesa)
+            return self._risposta(chiave)
+        finally:
+            self.thread_occupati -= 1
+
+    async def fetch(self, chiave):
+        self.chiamate += 1
+        attesa = self._attesa()
+        if self.pool is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, self._fetch_bloccante, chiave, attesa)
+        await asyncio.sleep(attesa)
+        return self._risposta(chiave)
+
+
+async def _scenario(lettura: LetturaResiliente, fasi: list[tuple[str, int]], chiavi: int = 20,
+                    concorrenza: int = 50, pool=None) -> dict:
+    backend = BackendSimulato(pool=pool)
+    risultati = {}
+    slot = asyncio.Semaphore(concorrenza)
+
+    async def richiesta(i, esiti):
+        chiave = f"CT-2024-{i % chiavi:06d}"
+        async with slot:
+            t0 = time.perf_counter()
+            try:
+                if lettura is None:
+                    await backend.fetch(chiave)
+                    esiti["ok"] += 1
+                else:
+                    esito = await lettura.leggi(chiave, lambda: backend.fetch(chiave), gruppo="Pratiche")
+                    esiti["stantii" if esito.stantio else "ok"] += 1
+            except Exception:
+                esiti["errori"] += 1
+            esiti["latenze"].append(time.perf_counter() - t0)
+
+    for modalita, richieste in fasi:
+        backend.modalita = modalita
+        esiti = {"ok": 0, "stantii": 0, "errori": 0, "latenze": []}
+        tasks = [asyncio.create_task(richiesta(i, esiti)) for i in range(richieste)]
+        # Senza deadline le richieste bloccate non terminano: si misura fino a 5 s
+        _, pendenti = await asyncio.wait(tasks, timeout=5.0)
+        for task in pendenti:
+            task.cancel()
+        esiti["latenze"].extend([5.0] * len(pendenti))
+        esiti["errori"] += len(pendenti)
+        latenze = sorted(esiti.pop("latenze"))
+        esiti["p99_ms"] = latenze[int(len(latenze) * 0.99) - 1] * 1000
+        esiti["thread_occupati"] = backend.thread_occupati
+        risultati[modalita] = esiti
+    return risultati
+
+
+async def _verifiche_breaker() -> list[tuple[str, bool]]:
+    """Errori di query rilanciati, breaker per collection, una sola prova nel semi-aperto."""
+    esiti = []
+    lettura = LetturaResiliente(deadline_s=0.2, hedging=False, soglia_breaker=2, riapertura_s=0.05)
+
+    async def ok():
+        return "ok"
+
+    async def query_non_valida():
+        raise ValueError("no such prop with name 'incentivo_su_prezzo'")
+
+    async def guasto():
+        raise ConnectionError("nodo Weaviate non raggiungibile")
+
+    await lettura.leggi("pratica", ok, gruppo="Pratiche")
+    await lettura.leggi("impianti", ok, gruppo="Impianti")
+    rilanciati = 0
+    for _ in range(5):
+        try:
+            await lettura.leggi("impianti", query_non_valida, gruppo="Impianti")
+        except ValueError:
+            rilanciati += 1
+    esiti.append(("errori di query rilanciati, non serviti dalla riserva", rilanciati == 5))
+    esiti.append(("errori di query non aprono il circuito", lettura.breaker("Impianti").lascia_passare()))
+
+    for _ in range(2):
+        await lettura.leggi("impianti", guasto, gruppo="Impianti")
+    pratica = await lettura.leggi("pratica", ok, gruppo="Pratiche")
+    esiti.append(("circuito aperto su Impianti non blocca Pratiche",
+                  not lettura.breaker("Impianti").lascia_passare() and not pratica.stantio))
+
+    await asyncio.sleep(0.06)
+    chiamate = 0
+
+    async def lenta():
+        nonlocal chiamate
+        chiamate += 1
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    await asyncio.gather(*(lettura.leggi("impianti", lenta, gruppo="Impianti") for _ in range(20)))
+    esiti.append(("una sola richiesta di prova nel semi-aperto", chiamate == 1))
+    return esiti
+
+
+def fault_injection(richieste: int = 1000, thread: int = 16) -> bool:
+    """Stampa i tre scenari; False se la configurazione in uso non rispetta deadline ed esiti attesi."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    deadline_s = 0.5
+    # Margine di scheduling dell'event loop sopra la deadline
+    budget_ms = deadline_s * 1000 + 50
+    fasi = [("normale", richieste), ("degradato", richieste), ("guasto", richieste)]
+    scenari = [
+        ("Senza controlli (riferimento)", None, False, False),
+        ("Deadline + hedging + breaker, client asincrono", LetturaResiliente(deadline_s=deadline_s), False, True),
+        (f"Deadline + hedging + breaker, client sincrono in {thread} thread (riferimento)",
+         LetturaResiliente(deadline_s=deadline_s), True, False),
+    ]
+    ok = True
+    print(f"📊 Fault injection: {richieste} richieste per fase (normale → degradato 10% bloccate → guasto)\n")
+    for nome, lettura, in_thread, verifica in scenari:
+        pool = ThreadPoolExecutor(max_workers=thread) if in_thread else None
+        try:
+            risultati = asyncio.run(_scenario(lettura, fasi, pool=pool))
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        print(f"  {nome}")
+        for modalita, r in risultati.items():
+            esito = r["p99_ms"] <= budget_ms and r["errori"] == 0 and r["thread_occupati"] == 0
+            if verifica:
+                ok &= esito
+            segno = ("✅" if esito else "❌") if verifica else "  "
+            print(f"  {segno} {modalita:<10} p99 {r['p99_ms']:8.1f} ms   ok {r['ok']:>5}   "
+                  f"stantii {r['stantii']:>5}   errori/bloccate {r['errori']:>5}   "
+                  f"thread ancora bloccati {r['thread_occupati']:>3}")
+
+    print(f"\n  Verifiche (p99 ≤ {budget_ms:.0f} ms, nessun errore né thread bloccato per il client asincrono)")
+    for descrizione, esito in asyncio.run(_verifiche_breaker()):
+        ok &= esito
+        print(f"  {'✅' if esito else '❌'} {descrizione}")
+    return ok
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Fault injection sulle letture Weaviate")
+    parser.add_argument("--fault-injection", action="store_true")
+    parser.add_argument("--richieste", type=int, default=1000)
+    parser.add_argument("--thread", type=int, default=16, help="Thread del pool per il client sincrono")
+    args = parser.parse_args()
+
+    if args.fault_injection:
+        sys.exit(0 if fault_injection(args.richieste, args.thread) else 1)
+    else:
+        parser.print_help()
@@ -0,0 +1,252 @@
+"""
+ricalcola_ammissibilita.py
+==========================
+Ricalcola `ammissibile_ct`, `motivazione_ammissibilita`, le zone climatiche
+ammissibili e il rapporto incentivo/prezzo per tutto il catalogo Impianti,
+applicando le regole correnti di regole_ct.py (soglie COP per zona,
+EHPA/EN 14511, Solar Keymark, limite 2.000 kW, tariffe).
+
+Il catalogo è letto con l'iteratore a cursore, valutato a blocchi in un pool
+di processi, e solo gli impianti cambiati vengono riscritti con
+aggiornamenti parziali concorrenti.
+
+Uso:
+    python ricalcola_ammissibilita.py              # ricalcola e aggiorna Weaviate
+    python ricalcola_ammissibilita.py --dry-run    # mostra solo le differenze
+    python ricalcola_ammissibilita.py --benchmark 50000
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from regole_ct import SOGLIE_COP, ZONE_CLIMATICHE, calcola_incentivo, valuta_ammissibilita
+
+PROPRIETA_REGOLE = [
+    "modello",
+    "tipo",
+    "potenza_kw",
+    "cop_a7w35",
+    "cop_nominale",
+    "superficie_unitaria_mq",
+    "certificazioni",
+    "prezzo_indicativo_eur",
+    "prezzo_indicativo_eur_mq",
+    "ammissibile_ct",
+    "motivazione_ammissibilita",
+    "zone_ammissibili",
+    "incentivo_su_prezzo",
+]
+
+
+def prezzo_unitario(impianto: dict):
+    """Prezzo di un'unità del modello: prezzo a corpo, oppure €/m² × superficie (collettori solari)."""
+    prezzo = impianto.get("prezzo_indicativo_eur")
+    if prezzo:
+        return prezzo
+    prezzo_mq = impianto.get("prezzo_indicativo_eur_mq")
+    superficie = impianto.get("superficie_unitaria_mq")
+    return prezzo_mq * superficie if prezzo_mq and superficie else None
+
+
+def incentivo_su_prezzo(impianto: dict) -> float:
+    """
+    Incentivo totale (privato) per euro di prezzo; 0 se non stimabile.
+    Il moltiplicatore PA è uguale per tutti i modelli, quindi l'ordinamento vale per ogni soggetto.
+    """
+    prezzo = prezzo_unitario(impianto)
+    stima = calcola_incentivo(
+        impianto.get("tipo") or "",
+        potenza_kw=impianto.get("potenza_kw"),
+        superficie_mq=impianto.get("superficie_unitaria_mq"),
+    )
+    if not prezzo or not stima or "incentivo_totale_eur" not in stima:
+        return 0.0
+    return round(stima["incentivo_totale_eur"] / prezzo, 4)
+
+
+def proprieta_derivate(impianto: dict) -> dict:
+    """Proprietà derivate usate dai filtri e dall'ordinamento lato server (anche all'import)."""
+    esito = valuta_impianto(impianto)
+    return {k: esito[k] for k in ("zone_ammissibili", "incentivo_su_prezzo")}
+
+
+def valuta_impianto(impianto: dict) -> dict:
+    """
+    Valuta un modello del catalogo in ogni zona climatica.
+    È ammissibile in una zona se le regole lo ammettono senza requisiti mancanti.
+    Una pompa di calore (B.2) senza COP nel catalogo non è ammessa in nessuna
+    zona: la soglia per zona non è verificabile.
+    """
+    zone = []
+    esclusioni = {}
+    cop = impianto.get("cop_a7w35") or impianto.get("cop_nominale")
+    for zona in ZONE_CLIMATICHE:
+        esito = valuta_ammissibilita(
+            impianto.get("tipo") or "",
+            potenza_kw=impianto.get("potenza_kw"),
+            cop_certificato=cop,
+            zona_climatica=zona,
+            superficie_mq=impianto.get("superficie_unitaria_mq"),
+            certificazioni=impianto.get("certificazioni"),
+        )
+        if not cop and esito.get("tipo_intervento_ct", "").startswith("B.2"):
+            esclusioni[zona] = f"COP non disponibile nel catalogo, soglia {SOGLIE_COP[zona]} da verificare"
+        elif esito["ammissibile"] and not esito["requisiti_mancanti"]:
+            zone.append(zona)
+        else:
+            motivo = esito["motivazione"] if esito["ammissibile"] is False else ""
+            esclusioni[zona] = "; ".join(filter(None, [motivo] + esito["requisiti_mancanti"])) or esito["motivazione"]
+
+    if len(zone) == len(ZONE_CLIMATICHE):
+        motivazione = f"Ammissibile in tutte le zone climatiche. {esito['motivazione']}"
+    elif zone:
+        motivazione = (f"Ammissibile nelle zone {', '.join(zone)}. "
+                       + " ".join(f"Zona {z}: {m}." for z, m in esclusioni.items()))
+    else:
+        motivazione = "NON AMMISSIBILE: " + next(iter(esclusioni.values()))
+
+    return {
+        "ammissibile_ct": bool(zone),
+        "motivazione_ammissibilita": motivazione,
+        "zone_ammissibili": zone,
+        "incentivo_su_prezzo": incentivo_su_prezzo(impianto),
+    }
+
+
+def valuta_blocco(blocco: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+    """Eseguita nei processi worker: restituisce solo gli impianti il cui esito è cambiato."""
+    cambiati = []
+    for uuid, impianto in blocco:
+        nuovo = valuta_impianto(impianto)
+        if any(impianto.get(k) != v for k, v in nuovo.items()):
+            cambiati.append((uuid, nuovo))
+    return cambiati
+
+
+def _blocchi(iterabile, dimensione: int):
+    it = iter(iterabile)
+    while blocco := list(islice(it, dimensione)):
+        yield blocco
+
+
+def ricalcola_catalogo(oggetti, chunk_size: int = 500, workers: int = None):
+    """
+    Valuta (uuid, proprietà) in parallelo a blocchi.
+    Restituisce (impianti valutati, lista dei cambiamenti).
+    """
+    valutati = 0
+    cambiamenti = []
+
+    def conta(blocchi):
+        nonlocal valutati
+        for blocco in blocchi:
+            valutati += len(blocco)
+            yield blocco
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for cambiati in pool.map(valuta_blocco, conta(_blocchi(oggetti, chunk_size))):
+            cambiamenti.extend(cambiati)
+    return valutati, cambiamenti
+
+
+def assicura_proprieta(coll):
+    """Aggiunge le proprietà derivate alle collection create prima della loro introduzione."""
+    from weaviate.classes.config import Property, DataType
+
+    esistenti = {p.name for p in coll.config.get().properties}
+    if "zone_ammissibili" not in esistenti:
+        coll.config.add_property(Property(name="zone_ammissibili", data_type=DataType.TEXT_ARRAY))
+    if "incentivo_su_prezzo" not in esistenti:
+        coll.config.add_property(Property(name="incentivo_su_prezzo", data_type=DataType.NUMBER))
+    if "prezzo_indicativo_eur_mq" not in esistenti:
+        coll.config.add_property(Property(name="prezzo_indicativo_eur_mq", data_type=DataType.NUMBER))
+
+
+def aggiorna_impianti(coll, cambiamenti, workers: int = 8) -> int:
+    """Aggiornamenti parziali (PATCH) concorrenti: le altre proprietà restano invariate."""
+    def aggiorna(cambiamento):
+        uuid, proprieta = cambiamento
+        coll.data.update(uuid=uuid, properties=proprieta)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(aggiorna, cambiamenti))
+    return len(cambiamenti)
+
+
+def ricalcola(client, dry_run: bool = False, chunk_size: int = 500, workers: int = None):
+    """Job completo su Weaviate: lettura, valutazione parallela, scrittura delle differenze."""
+    coll = client.collections.get("Impianti")
+    if not dry_run:
+        assicura_proprieta(coll)
+
+    oggetti = (
+        (str(obj.uuid), obj.properties)
+        for obj in coll.iterator(return_properties=PROPRIETA_REGOLE, cache_size=chunk_size)
+    )
+
+    t0 = time.perf_counter()
+    valutati, cambiamenti = ricalcola_catalogo(oggetti, chunk_size, workers)
+    t_valutazione = time.perf_counter() - t0
+
+    for uuid, nuovo in cambiamenti[:20]:
+        print(f"  🔄 {uuid}: ammissibile_ct={nuovo['ammissibile_ct']} zone={','.join(nuovo['zone_ammissibili']) or '-'}")
+    if len(cambiamenti) > 20:
+        print(f"  ... e altri {len(cambiamenti) - 20}")
+
+    if not dry_run:
+        aggiorna_impianti(coll, cambiamenti)
+
+    durata = time.perf_counter() - t0
+    print(f"\n✅ {valutati} modelli valutati, {len(cambiamenti)} cambiati"
+          f"{' (dry-run, nessuna scrittura)' if dry_run else ' e aggiornati'}")
+    print(f"⏱️  Valutazione: {valutati / t_valutazione if t_valutazione else 0:,.0f} modelli/s — "
+          f"runtime totale {durata:.2f}s")
+
+
+def catalogo_sintetico(n: int):
+    tipi = [
+        ("Pompa di calore aria-acqua", ["EHPA Gold", "EN 14511", "CE"]),
+        ("Pompa di calore geotermica", ["CE"]),
+        ("Collettore solare termico piano", ["Solar Keymark", "EN 12975", "CE"]),
+        ("Scaldacqua a pompa di calore", ["EN 16147", "CE"]),
+        ("Caldaia a biomassa (pellet)", ["EN 303-5", "CE"]),
+        ("Caldaia a gas non condensante", ["CE"]),
+    ]
+    for i in range(n):
+        tipo, certificazioni = tipi[i % len(tipi)]
+        yield f"sintetico-{i}", {
+            "modello": f"Modello {i}",
+            "tipo": tipo,
+            "potenza_kw": 2.0 + (i % 3000),
+            "cop_a7w35": 2.4 + (i % 12) / 10,
+            "superficie_unitaria_mq": 1.0 + (i % 4) / 2,
+            "certificazioni": certificazioni,
+            "prezzo_indicativo_eur": 900.0 + 37 * (i % 400),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ricalcolo ammissibilità del catalogo Impianti")
+    parser.add_argument("--dry-run", action="store_true", help="Non scrive le differenze su Weaviate")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Valuta N modelli sintetici (nessuna connessione)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        t0 = time.perf_counter()
+        valutati, cambiamenti = ricalcola_catalogo(catalogo_sintetico(args.benchmark), args.chunk_size, args.workers)
+        durata = time.perf_counter() - t0
+        print(f"📊 {valutati:,} modelli in {durata:.2f}s ({valutati / durata:,.0f} modelli/s, "
+              f"{args.workers} processi), {len(cambiamenti):,} cambiati")
+    else:
+        from import_data import get_client
+
+        client = get_client()
+        try:
+            ricalcola(client, args.dry_run, args.chunk_size, args.workers)
+        finally:
+            client.close()
@@ -0,0 +1,32 @@
+"""
+servizio.py
+===========
+Entry point ASGI: l'API Elysia con i tool del Conto Termico registrati.
+
+`elysia.api.main:app` crea un albero per ogni conversazione (/init/tree) con
+i soli tool predefiniti; `crea_app()` fa sì che ogni nuovo Tree riceva anche
+i tool di tools.py, come l'albero costruito da main.setup_elysia().
+L'import del modulo non ha effetti: l'aggancio avviene solo in `crea_app()`,
+e `register_tools` non registra due volte gli stessi tool su un tree.
+
+Uso (Dockerfile, start.sh, carico.py):
+    uvicorn servizio:crea_app --factory --host 0.0.0.0 --port 8000
+"""
+
+
+def crea_app():
+    """App FastAPI di Elysia con i tool personalizzati in ogni Tree."""
+    from elysia import Tree
+    from elysia.api.main import app
+
+    from tools import register_tools
+
+    init_tree = Tree.__init__
+    if not getattr(init_tree, "_con_tool_conto_termico", False):
+        def _init_con_tool(self, *args, **kwargs):
+            init_tree(self, *args, **kwargs)
+            register_tools(self)
+
+        _init_con_tool._con_tool_conto_termico = True
+        Tree.__init__ = _init_con_tool
+    return app
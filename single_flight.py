@@ -0,0 +1,209 @@
+"""
+single_flight.py
+================
+Coalescenza delle letture concorrenti identiche verso Weaviate.
+
+Quando più operatori (e il portale clienti) interrogano la stessa pratica
+nello stesso momento, le richieste con la stessa chiave condividono un'unica
+chiamata al backend. Facoltativamente il risultato resta valido per una breve
+finestra (qualche centinaio di ms) e serve anche le richieste successive.
+
+Benchmark (backend simulato, nessuna connessione):
+    python single_flight.py --benchmark
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from enum import Enum
+
+# Finestra di riuso dei risultati per le letture dei tool (secondi)
+FINESTRA_LETTURE = 0.3
+
+
+class SingleFlight:
+    """Una sola chiamata in volo per chiave; i chiamanti concorrenti ne attendono l'esito."""
+
+    def __init__(self, finestra: float = 0.0, max_recenti: int = 1024):
+        self.finestra = finestra
+        self.max_recenti = max_recenti
+        self.chiamate = 0
+        self._in_volo: dict = {}
+        self._recenti = OrderedDict()
+
+    def _memorizza(self, chiave, valore):
+        adesso = time.monotonic()
+        self._recenti[chiave] = (adesso + self.finestra, valore)
+        self._recenti.move_to_end(chiave)
+        # La finestra è uguale per tutte le chiavi: le voci più vecchie scadono per prime
+        while self._recenti:
+            scadenza, _ = next(iter(self._recenti.values()))
+            if scadenza > adesso and len(self._recenti) <= self.max_recenti:
+                break
+            self._recenti.popitem(last=False)
+
+    def _conclusa(self, chiave, task):
+        del self._in_volo[chiave]
+        if task.cancelled():
+            return
+        # Segna l'eccezione come letta anche se nessun chiamante è rimasto in attesa
+        if task.exception() is None and self.finestra:
+            self._memorizza(chiave, task.result())
+
+    async def esegui(self, chiave, funzione, *args, **kwargs):
+        """
+        Esegue `funzione(*args, **kwargs)` (coroutine) una sola volta per chiave.
+        La chiamata gira in un task proprio: la cancellazione di un chiamante non la
+        interrompe per gli altri. Le eccezioni sono propagate a tutti i chiamanti e
+        non vengono memorizzate.
+        """
+        if self.finestra:
+            recente = self._recenti.get(chiave)
+            if recente is not None:
+                scadenza, valore = recente
+                if time.monotonic() < scadenza:
+                    return valore
+                del self._recenti[chiave]
+
+        task = self._in_volo.get(chiave)
+        if task is None:
+            task = asyncio.ensure_future(funzione(*args, **kwargs))
+            self._in_volo[chiave] = task
+            self.chiamate += 1
+            task.add_done_callback(lambda t: self._conclusa(chiave, t))
+
+        return await asyncio.shield(task)
+
+
+# Istanza condivisa dai tool in tools.py
+LETTURE = SingleFlight(finestra=FINESTRA_LETTURE)
+
+
+def _canonico(valore):
+    """
+    Forma confrontabile e hashable di filtri, ordinamenti e parametri: dipende solo
+    dai valori (il repr degli oggetti Filter/Sort di Weaviate contiene l'indirizzo).
+    """
+    if valore is None or isinstance(valore, (str, int, float, bool)):
+        return valore
+    if isinstance(valore, Enum):
+        return valore.value
+    if isinstance(valore, (list, tuple, set, frozenset)):
+        elementi = tuple(_canonico(v) for v in valore)
+        return tuple(sorted(elementi, key=repr)) if isinstance(valore, (set, frozenset)) else elementi
+    if isinstance(valore, dict):
+        return tuple(sorted((str(k), _canonico(v)) for k, v in valore.items()))
+    if hasattr(valore, "isoformat"):
+        return valore.isoformat()
+    if hasattr(valore, "__dict__"):
+        return (type(valore).__name__, _canonico({
+            k: v for k, v in vars(valore).items() if not k.startswith("_")
+        }))
+    return repr(valore)
+
+
+def chiave_query(collection: str, filters=None, **kwargs) -> tuple:
+    """Chiave di coalescenza per una fetch_objects: collection, filtri e parametri."""
+    return (collection, _canonico(filters), _canonico(kwargs))
+
+
+async def fetch_objects_condiviso(client_manager, collection: str, filters=None, **kwargs):
+    """
+    fetch_objects con coalescenza: le richieste identiche concorrenti condividono
+    un'unica query. La query usa il client asincrono di Weaviate, così deadline e
+    hedging (vedi resilienza.py) la cancellano davvero invece di lasciare un thread
+    bloccato su un nodo lento.
+
+    Restituisce una `Lettura`: `.risultato` è il QueryReturn (condiviso tra i
+    chiamanti, da trattare in sola lettura), `.stantio` indica che è l'ultimo
+    valore noto servito mentre Weaviate non risponde.
+    """
+    from resilienza import LETTURE_WEAVIATE
+
+    async def query():
+        async with client_manager.connect_to_async_client() as client:
+            return await client.collections.get(collection).query.fetch_objects(filters=filters, **kwargs)
+
+    chiave = chiave_query(collection, filters, **kwargs)
+    return await LETTURE.esegui(
+        chiave,
+        LETTURE_WEAVIATE.leggi, chiave, query, gruppo=collection,
+    )
+
+
+# ─────────────────────────────────────────
+# BENCHMARK
+# ─────────────────────────────────────────
+
+async def _carico(flight, richieste: int, chiavi: int, raffica: int,
+                  latenza_ms: float, connessioni: int, seed: int = 42):
+    rnd = random.Random(seed)
+    slot = asyncio.Semaphore(connessioni)
+    chiamate_backend = 0
+
+    async def backend(chiave):
+        nonlocal chiamate_backend
+        chiamate_backend += 1
+        async with slot:
+            await asyncio.sleep(latenza_ms / 1000 * rnd.uniform(0.5, 1.5))
+        return {"codice_pratica": chiave, "stato": "In istruttoria"}
+
+    latenze = []
+
+    async def richiesta(chiave):
+        t0 = time.perf_counter()
+        if flight is None:
+            await backend(chiave)
+        else:
+            await flight.esegui(chiave, backend, chiave)
+        latenze.append(time.perf_counter() - t0)
+
+    # Raffiche: `raffica` richieste simultanee, poi una breve pausa
+    tasks = []
+    for inizio in range(0, richieste, raffica):
+        for _ in range(min(raffica, richieste - inizio)):
+            chiave = f"CT-2024-{rnd.randrange(chiavi):06d}"
+            tasks.append(asyncio.create_task(richiesta(chiave)))
+        await asyncio.sleep(rnd.uniform(0.0, 0.02))
+    await asyncio.gather(*tasks)
+
+    latenze.sort()
+    return {
+        "chiamate_backend": chiamate_backend,
+        "p50_ms": latenze[len(latenze) // 2] * 1000,
+        "p99_ms": latenze[int(len(latenze) * 0.99) - 1] * 1000,
+    }
+
+
+def benchmark(richieste: int = 10_000, chiavi: int = 100, raffica: int = 500,
+              latenza_ms: float = 20.0, connessioni: int = 32):
+    print(f"📊 {richieste:,} richieste su {chiavi} chiavi calde, raffiche da {raffica}, "
+          f"backend {latenza_ms:.0f} ms con {connessioni} connessioni\n")
+    scenari = [
+        ("Senza coalescenza", None),
+        ("Single-flight", SingleFlight()),
+        (f"Single-flight + finestra {FINESTRA_LETTURE * 1000:.0f} ms", SingleFlight(finestra=FINESTRA_LETTURE)),
+    ]
+    for nome, flight in scenari:
+        r = asyncio.run(_carico(flight, richieste, chiavi, raffica, latenza_ms, connessioni))
+        print(f"  {nome:<38} chiamate backend {r['chiamate_backend']:>6,}   "
+              f"p50 {r['p50_ms']:7.1f} ms   p99 {r['p99_ms']:7.1f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark della coalescenza delle letture")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--richieste", type=int, default=10_000)
+    parser.add_argument("--chiavi", type=int, default=100)
+    parser.add_argument("--raffica", type=int, default=500)
+    parser.add_argument("--latenza-ms", type=float, default=20.0)
+    parser.add_argument("--connessioni", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.richieste, args.chiavi, args.raffica, args.latenza_ms, args.connessioni)
+    else:
+        parser.print_help()
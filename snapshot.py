@@ -0,0 +1,205 @@
+"""
+snapshot.py
+===========
+Snapshot binari locali delle collection (Normative, Pratiche, Impianti)
+per avviare un nuovo ambiente senza rieseguire import_data.py.
+
+Per ogni collection la cartella di snapshot contiene:
+    <Nome>.parquet      ← proprietà + uuid, colonnare compresso (zstd)
+    <Nome>.vectors.f32  ← blocco grezzo float32, una riga per oggetto
+    manifest.json       ← schema della collection, conteggi, dimensione vettori
+
+Uso:
+    python snapshot.py export snapshot/
+    python snapshot.py restore snapshot/ [--sovrascrivi] [--workers 4]
+    python snapshot.py confronta snapshot/ --sovrascrivi   # time-to-ready vs import_data.py
+
+Richiede pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+
+COLLECTIONS = ["Normative", "Pratiche", "Impianti"]
+VECTOR_NAME = "default"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Gli snapshot richiedono pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+# Tipi Weaviate → tipi Arrow (usato anche da export_pratiche.py per lo schema Parquet)
+def tipo_arrow(pa, tipo_weaviate: str):
+    base = {
+        "text": pa.string(), "uuid": pa.string(), "int": pa.int64(), "number": pa.float64(),
+        "boolean": pa.bool_(), "date": pa.timestamp("us", tz="UTC"),
+    }
+    elemento = tipo_weaviate.removesuffix("[]")
+    if elemento not in base:
+        raise ValueError(f"Tipo di proprietà non supportato in Arrow: {tipo_weaviate}")
+    return pa.list_(base[elemento]) if tipo_weaviate.endswith("[]") else base[elemento]
+
+
+def schema_arrow(pa, config):
+    """Schema Arrow esplicito: tutte le proprietà della collection, anche se assenti nel primo oggetto."""
+    return pa.schema(
+        [("_uuid", pa.string())]
+        + [(p.name, tipo_arrow(pa, p.data_type.value)) for p in config.properties]
+    )
+
+
+def export_collection(client, nome: str, cartella: str) -> dict:
+    """Esporta proprietà, uuid e vettori di una collection. Restituisce la voce del manifest."""
+    pa = _pyarrow()
+    coll = client.collections.get(nome)
+    config = coll.config.get()
+    schema = schema_arrow(pa, config)
+
+    righe = []
+    dim = None
+    with open(os.path.join(cartella, f"{nome}.vectors.f32"), "wb") as f_vett:
+        for obj in coll.iterator(include_vector=True):
+            vettore = obj.vector.get(VECTOR_NAME) if obj.vector else None
+            if vettore is None:
+                raise ValueError(f"{nome}/{obj.uuid}: vettore '{VECTOR_NAME}' assente")
+            if dim is None:
+                dim = len(vettore)
+            f_vett.write(struct.pack(f"<{dim}f", *vettore))
+            righe.append({"_uuid": str(obj.uuid), **obj.properties})
+
+    tabella = pa.Table.from_pylist(righe, schema=schema)
+    pa.parquet.write_table(tabella, os.path.join(cartella, f"{nome}.parquet"), compression="zstd")
+
+    return {
+        "schema": config.to_dict(),
+        "oggetti": len(righe),
+        "dim": dim,
+    }
+
+
+def export_snapshot(client, cartella: str):
+    """Esporta tutte le collection in `cartella`."""
+    os.makedirs(cartella, exist_ok=True)
+    manifest = {"creato": time.strftime("%Y-%m-%dT%H:%M:%S"), "collections": {}}
+    for nome in COLLECTIONS:
+        t0 = time.perf_counter()
+        manifest["collections"][nome] = voce = export_collection(client, nome, cartella)
+        print(f"✅ {nome}: {voce['oggetti']} oggetti esportati in {time.perf_counter() - t0:.2f}s")
+    with open(os.path.join(cartella, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def restore_collection(client, nome: str, voce: dict, cartella: str,
+                       sovrascrivi: bool = False, workers: int = 4, batch_size: int = 200) -> int:
+    """Ricrea la collection dallo schema e inserisce gli oggetti con i vettori forniti."""
+    pa = _pyarrow()
+
+    if client.collections.exists(nome):
+        if not sovrascrivi:
+            raise RuntimeError(f"La collection '{nome}' esiste già (usa --sovrascrivi)")
+        client.collections.delete(nome)
+    client.collections.create_from_dict(voce["schema"])
+    coll = client.collections.get(nome)
+
+    righe = pa.parquet.read_table(os.path.join(cartella, f"{nome}.parquet")).to_pylist()
+    if not righe:
+        return 0
+
+    record = struct.Struct(f"<{voce['dim']}f")
+    with open(os.path.join(cartella, f"{nome}.vectors.f32"), "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as vettori:
+        with coll.batch.fixed_size(batch_size=batch_size, concurrent_requests=workers) as batch:
+            for i, riga in enumerate(righe):
+                uuid = riga.pop("_uuid")
+                batch.add_object(
+                    properties={k: v for k, v in riga.items() if v is not None},
+                    uuid=uuid,
+                    vector={VECTOR_NAME: list(record.unpack_from(vettori, i * record.size))},
+                )
+
+    if coll.batch.failed_objects:
+        print(f"⚠️  {nome}: {len(coll.batch.failed_objects)} oggetti non inseriti")
+    return len(righe) - len(coll.batch.failed_objects)
+
+
+def restore_snapshot(client, cartella: str, sovrascrivi: bool = False, workers: int = 4):
+    """Ripristina tutte le collection del manifest e riporta throughput e time-to-ready."""
+    with open(os.path.join(cartella, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    t_inizio = time.perf_counter()
+    totale = 0
+    for nome, voce in manifest["collections"].items():
+        t0 = time.perf_counter()
+        inseriti = restore_collection(client, nome, voce, cartella, sovrascrivi, workers)
+        durata = time.perf_counter() - t0
+        totale += inseriti
+        print(f"✅ {nome}: {inseriti}/{voce['oggetti']} oggetti in {durata:.2f}s "
+              f"({inseriti / durata if durata else 0:,.0f} oggetti/s)")
+
+    durata = time.perf_counter() - t_inizio
+    print(f"\n⏱️  Time-to-ready da snapshot: {durata:.2f}s "
+          f"({totale / durata if durata else 0:,.0f} oggetti/s, {workers} richieste concorrenti)")
+    return durata, totale
+
+
+def confronta(client, cartella: str, workers: int = 4):
+    """
+    Time-to-ready di import_data.py (embedding con cache) e del restore dallo snapshot,
+    sullo stesso cluster. Elimina e ricrea le collection.
+    """
+    from import_data import create_collections, crea_embedder_con_cache, import_all_data
+
+    for nome in COLLECTIONS:
+        if client.collections.exists(nome):
+            client.collections.delete(nome)
+
+    print("📥 import_data...")
+    t0 = time.perf_counter()
+    create_collections(client)
+    embedder, cache = crea_embedder_con_cache()
+    import_all_data(client, embedder, cache)
+    if cache is not None:
+        cache.close()
+    durata_import = time.perf_counter() - t0
+    oggetti = sum(client.collections.get(n).aggregate.over_all(total_count=True).total_count for n in COLLECTIONS)
+
+    print("\n📦 Restore da snapshot...")
+    durata_restore, _ = restore_snapshot(client, cartella, sovrascrivi=True, workers=workers)
+
+    print(f"\n📊 Time-to-ready su {oggetti} oggetti")
+    print(f"   import_data.py  {durata_import:8.2f}s  ({oggetti / durata_import:,.0f} oggetti/s)")
+    print(f"   snapshot        {durata_restore:8.2f}s  ({oggetti / durata_restore:,.0f} oggetti/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot locali delle collection Conto Termico")
+    parser.add_argument("comando", choices=["export", "restore", "confronta"])
+    parser.add_argument("cartella")
+    parser.add_argument("--sovrascrivi", action="store_true", help="Elimina le collection esistenti prima del restore")
+    parser.add_argument("--workers", type=int, default=4, help="Richieste batch concorrenti nel restore")
+    args = parser.parse_args()
+
+    from import_data import get_client
+
+    client = get_client()
+    try:
+        if args.comando == "export":
+            export_snapshot(client, args.cartella)
+        elif args.comando == "confronta":
+            if not args.sovrascrivi:
+                parser.error("confronta elimina e ricrea le collection: aggiungere --sovrascrivi")
+            confronta(client, args.cartella, args.workers)
+        else:
+            restore_snapshot(client, args.cartella, args.sovrascrivi, args.workers)
+    finally:
+        client.close()
@@ -1,3 +1,3 @@
 
 #!/bin/bash
-elysia start --port 8000
\ No newline at end of file
+uvicorn servizio:crea_app --factory --host 0.0.0.0 --port 8000
\ No newline at end of file
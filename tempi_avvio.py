@@ -0,0 +1,122 @@
+"""
+tempi_avvio.py
+==============
+Budget sul tempo di import a freddo dei moduli dell'applicazione.
+
+Ogni modulo è importato in un processo Python nuovo con `-X importtime`.
+Il budget riguarda il tempo proprio dei moduli dell'app caricati (il modulo
+e gli altri file .py di questa cartella che importa), esclusa la libreria
+standard: il suo costo dipende dalla macchina e da solo esaurirebbe un
+budget assoluto. Il controllo fallisce (exit 1) se:
+- il budget sul tempo proprio è superato;
+- viene caricato un package di terze parti (qualunque modulo di primo
+  livello fuori dalla libreria standard e dall'app, oltre a quelli che
+  l'interprete carica già all'avvio): le dipendenze restano lazy;
+- i moduli in BUDGET_CUMULATIVO_MS superano il tempo cumulativo indicato
+  (libreria standard inclusa).
+
+Uso:
+    python tempi_avvio.py             # controlla tutti i moduli
+    python tempi_avvio.py --ripeti 5  # mediana su 5 esecuzioni
+"""
+
+import compileall
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+_CARTELLA = os.path.dirname(os.path.abspath(__file__))
+
+# Budget per modulo, in millisecondi (tempo proprio dei moduli dell'app importati).
+# Le misure tipiche sono 0,2-3 ms: il margine assorbe la variabilità della macchina
+# e fa scattare il controllo solo per lavoro vero al caricamento (file, query, calcoli).
+BUDGET_MS = {
+    "import_data": 10,
+    "regole_ct": 5,
+    "documenti": 10,
+    "zone_climatiche": 10,
+    "preprocessing": 5,
+    "single_flight": 5,
+    "resilienza": 5,
+    "tools": 15,
+    "main": 15,
+    "servizio": 5,
+}
+
+# Moduli dell'applicazione: i file .py di questa cartella
+MODULI_APP = {f[:-3] for f in os.listdir(_CARTELLA) if f.endswith(".py")}
+
+# Budget sul tempo cumulativo a freddo (ms), per i moduli caricati da script e job
+BUDGET_CUMULATIVO_MS = {
+    "import_data": 50,
+}
+
+_RIGA = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def misura(modulo: str) -> tuple[float, float, set[str]]:
+    """(ms propri dei moduli dell'app, ms cumulativi dell'import di `modulo`, package di primo livello importati)."""
+    # I package importati si leggono da sys.modules: -X importtime elenca anche
+    # i tentativi falliti (es. org.python.core provato da copy)
+    codice = f"import {modulo}, sys; print(' '.join({{m.split('.')[0] for m in sys.modules}}))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codice],
+        cwd=_CARTELLA, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {modulo} fallito:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    propri = 0.0
+    cumulativo = None
+    importati = set(proc.stdout.split())
+    for riga in proc.stderr.splitlines():
+        m = _RIGA.match(riga)
+        if not m:
+            continue
+        if m.group(4) in MODULI_APP:
+            propri += int(m.group(1)) / 1000
+        if m.group(4) == modulo and len(m.group(3)) == 1:
+            cumulativo = int(m.group(2)) / 1000
+    return propri, cumulativo, importati
+
+
+def terze_parti(importati: set[str], avvio: set[str]) -> list[str]:
+    """Package importati che non sono della libreria standard, dell'app o dell'avvio dell'interprete."""
+    return sorted(importati - set(sys.stdlib_module_names) - MODULI_APP - avvio)
+
+
+def controlla(ripeti: int = 3) -> bool:
+    # Bytecode aggiornato prima di misurare: un .pyc scaduto sposterebbe la compilazione nel tempo di import
+    compileall.compile_dir(_CARTELLA, maxlevels=0, quiet=1)
+    # Moduli caricati da un interprete vuoto (site, hook .pth di setuptools, ...)
+    _, _, avvio = misura("sys")
+    ok = True
+    for modulo, budget in BUDGET_MS.items():
+        misure = []
+        cumulativi = []
+        importati = set()
+        for _ in range(ripeti):
+            ms, cumulativo, importati = misura(modulo)
+            misure.append(ms)
+            cumulativi.append(cumulativo)
+        ms = statistics.median(misure)
+        cumulativo = statistics.median(cumulativi)
+        esterni = terze_parti(importati, avvio)
+        budget_cumulativo = BUDGET_CUMULATIVO_MS.get(modulo)
+
+        esito = ms <= budget and not esterni and (budget_cumulativo is None or cumulativo <= budget_cumulativo)
+        ok &= esito
+        nota = f"  importa: {', '.join(esterni)}" if esterni else ""
+        limite = f" (budget {budget_cumulativo} ms)" if budget_cumulativo is not None else ""
+        print(f"  {'✅' if esito else '❌'} {modulo:<16} {ms:6.1f} ms app  (budget {budget} ms)   "
+              f"{cumulativo:6.1f} ms totali{limite}{nota}")
+    return ok
+
+
+if __name__ == "__main__":
+    ripeti = int(sys.argv[sys.argv.index("--ripeti") + 1]) if "--ripeti" in sys.argv else 3
+    print("⏱️  Tempi di import a freddo dei moduli dell'applicazione\n")
+    sys.exit(0 if controlla(ripeti) else 1)
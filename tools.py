@@ -7,11 +7,29 @@ Ogni tool è una funzione async decorata con @tool.
 Il docstring descrive all'LLM quando e come usare il tool.
 """
 
-from elysia import tool, Error, Tree
-
-
-def register_tools(tree: Tree):
-    """Registra tutti i tool custom nel tree Elysia."""
+from typing import TYPE_CHECKING
+
+from regole_ct import (
+    SEZIONI_CHECKLIST,
+    SOGLIE_COP,
+    calcola_incentivo,
+    genera_checklist,
+    valuta_ammissibilita,
+)
+from documenti import CATALOGO_DOCUMENTI, cerca_documento
+from zone_climatiche import risolvi_zona
+
+if TYPE_CHECKING:
+    from elysia import Tree
+
+def register_tools(tree: "Tree"):
+    """Registra tutti i tool custom nel tree Elysia (una sola volta per tree)."""
+    if getattr(tree, "_tool_conto_termico", False):
+        return tree
+    tree._tool_conto_termico = True
+
+    from elysia import tool, Error
+    from accesso_dati import ImpiantoCandidato, PraticaSintesi, StatoPratica, compatto, leggi
 
     # ─────────────────────────────────────────────────────────
     # TOOL 1: Verifica ammissibilità impianto
@@ -24,6 +42,7 @@ def register_tools(tree: Tree):
         zona_climatica: str = None,
         superficie_mq: float = None,
         certificazioni: list[str] = None,
+        comune: str = None,
         client_manager=None
     ):
         """
@@ -42,114 +61,23 @@ def register_tools(tree: Tree):
         - zona_climatica: zona climatica dell'edificio A/B/C/D/E/F (opzionale)
         - superficie_mq: superficie collettori in m² (opzionale, per solare termico)
         - certificazioni: lista certificazioni presenti (opzionale)
+        - comune: comune o indirizzo dell'impianto, usato per ricavare la zona climatica se non indicata (opzionale)
         - client_manager: client Weaviate (iniettato automaticamente da Elysia)
         """
 
-        # Soglie minime per zona climatica (pompe di calore)
-        soglie_cop = {
-            "A": 2.6, "B": 2.6,
-            "C": 2.8, "D": 2.8,
-            "E": 3.0, "F": 3.0
-        }
-
-        risultati = {
-            "tipo_impianto": tipo_impianto,
-            "ammissibile": None,
-            "motivazione": "",
-            "requisiti_mancanti": [],
-            "raccomandazioni": []
-        }
+        if not zona_climatica and comune:
+            zona_climatica = risolvi_zona(comune)
 
-        tipo_lower = tipo_impianto.lower()
-
-        # --- Pompa di calore ---
-        if "pompa di calore" in tipo_lower or "heat pump" in tipo_lower:
-            tipo_intervento = "B.2 - Pompe di calore per climatizzazione invernale"
-            risultati["tipo_intervento_ct"] = tipo_intervento
-            risultati["durata_incentivo"] = "5 anni"
-
-            problemi = []
-
-            if cop_certificato and zona_climatica:
-                soglia = soglie_cop.get(zona_climatica.upper(), 2.8)
-                if cop_certificato >= soglia:
-                    risultati["ammissibile"] = True
-                    risultati["motivazione"] = f"COP {cop_certificato} ≥ soglia minima {soglia} per zona {zona_climatica}. ✅"
-                else:
-                    problemi.append(f"COP {cop_certificato} < soglia minima {soglia} per zona {zona_climatica}")
-            elif cop_certificato and not zona_climatica:
-                risultati["raccomandazioni"].append("Specifica la zona climatica per una verifica precisa del COP minimo")
-
-            if potenza_kw and potenza_kw > 2000:
-                problemi.append(f"Potenza {potenza_kw} kW supera il limite massimo di 2.000 kW")
-
-            if certificazioni:
-                cert_lower = [c.lower() for c in certificazioni]
-                if not any("ehpa" in c or "en 14511" in c for c in cert_lower):
-                    risultati["requisiti_mancanti"].append("Certificazione EHPA o test EN 14511 richiesta")
-            else:
-                risultati["requisiti_mancanti"].append("Verificare presenza certificazione EHPA o EN 14511")
-
-            if problemi:
-                risultati["ammissibile"] = False
-                risultati["motivazione"] = "Non ammissibile: " + "; ".join(problemi)
-
-            if risultati["ammissibile"] is None:
-                risultati["ammissibile"] = True
-                risultati["motivazione"] = "Tipo impianto compatibile con CT 2.0. Verificare COP e certificazioni."
-
-        # --- Solare termico ---
-        elif "solare" in tipo_lower:
-            tipo_intervento = "B.4 - Collettori solari termici"
-            risultati["tipo_intervento_ct"] = tipo_intervento
-            risultati["durata_incentivo"] = "5 anni"
-
-            if superficie_mq and superficie_mq < 1.5:
-                risultati["ammissibile"] = False
-                risultati["motivazione"] = f"Superficie {superficie_mq} m² < minimo 1,5 m² richiesto"
-            else:
-                risultati["ammissibile"] = True
-                risultati["motivazione"] = "Solare termico ammissibile. Verificare certificazione Solar Keymark."
-
-            if certificazioni:
-                if not any("solar keymark" in c.lower() for c in certificazioni):
-                    risultati["requisiti_mancanti"].append("Certificazione Solar Keymark richiesta")
-            else:
-                risultati["requisiti_mancanti"].append("Verificare presenza certificazione Solar Keymark o equivalente europea")
-
-        # --- Caldaia biomassa ---
-        elif "biomassa" in tipo_lower or "pellet" in tipo_lower or "legna" in tipo_lower:
-            tipo_intervento = "B.5 - Generatori di calore a biomassa"
-            risultati["tipo_intervento_ct"] = tipo_intervento
-            risultati["durata_incentivo"] = "5 anni"
-            risultati["ammissibile"] = True
-            risultati["motivazione"] = "Caldaia a biomassa ammissibile (tipologia B.5). Verificare certificazione emissioni EN 303-5."
-            risultati["requisiti_mancanti"].append("Certificato emissioni EN 303-5 obbligatorio")
-
-        # --- Caldaia a gas non condensante ---
-        elif "gas" in tipo_lower and "condensaz" not in tipo_lower:
-            risultati["ammissibile"] = False
-            risultati["motivazione"] = "❌ Le caldaie a gas NON a condensazione non rientrano negli interventi del Conto Termico 2.0."
-
-        # --- Caldaia a condensazione ---
-        elif "condensaz" in tipo_lower:
-            tipo_intervento = "B.1 - Sostituzione con caldaie a condensazione"
-            risultati["tipo_intervento_ct"] = tipo_intervento
-            risultati["durata_incentivo"] = "2 anni"
-            risultati["ammissibile"] = True
-            risultati["motivazione"] = "Caldaia a condensazione ammissibile (tipologia B.1). Durata incentivo: 2 anni."
-
-        # --- Scaldacqua pompa di calore ---
-        elif "scaldacqua" in tipo_lower or "acs" in tipo_lower:
-            tipo_intervento = "B.3 - Scaldacqua a pompa di calore"
-            risultati["tipo_intervento_ct"] = tipo_intervento
-            risultati["durata_incentivo"] = "2 anni"
-            risultati["ammissibile"] = True
-            risultati["motivazione"] = "Scaldacqua a pompa di calore ammissibile (tipologia B.3)."
-
-        else:
-            risultati["ammissibile"] = None
-            risultati["motivazione"] = f"Tipo impianto '{tipo_impianto}' non riconosciuto. Consultare il DM 16/02/2016 per la classificazione corretta."
+        risultati = valuta_ammissibilita(
+            tipo_impianto,
+            potenza_kw=potenza_kw,
+            cop_certificato=cop_certificato,
+            zona_climatica=zona_climatica,
+            superficie_mq=superficie_mq,
+            certificazioni=certificazioni,
+        )
+        if zona_climatica:
+            risultati["zona_climatica"] = zona_climatica
 
         yield risultati
         
@@ -166,7 +94,8 @@ def register_tools(tree: Tree):
         potenza_kw: float = None,
         superficie_mq: float = None,
         zona_climatica: str = None,
-        tipo_soggetto: str = "privato"
+        tipo_soggetto: str = "privato",
+        comune: str = None
     ):
         """
         Stima l'incentivo annuo e totale ottenibile con il Conto Termico GSE.
@@ -183,77 +112,23 @@ def register_tools(tree: Tree):
         - superficie_mq: superficie collettori in m² (per solare termico)
         - zona_climatica: zona climatica A/B/C/D/E/F
         - tipo_soggetto: "privato" o "PA" (Pubblica Amministrazione)
+        - comune: comune o indirizzo dell'impianto, usato per ricavare la zona climatica se non indicata (opzionale)
         """
 
-        # Tariffe incentivo (€/anno per kW o m²) - dati semplificati da DM 16/02/2016
-        # In produzione queste tariffe andrebbero lette dalla collection Normative
-        tariffe = {
-            "pompa di calore": {
-                "tariffa_base_kwh": 110,   # €/kW/anno indicativo
-                "durata_anni": 5,
-                "min_kw": 5, "max_kw": 2000
-            },
-            "solare termico": {
-                "tariffa_base_mq": 245,    # €/m²/anno indicativo
-                "durata_anni": 5,
-                "min_mq": 1.5
-            },
-            "biomassa": {
-                "tariffa_base_kwh": 95,    # €/kW/anno indicativo
-                "durata_anni": 5,
-                "min_kw": 5, "max_kw": 2000
-            },
-            "caldaia condensazione": {
-                "tariffa_base_kwh": 65,    # €/kW/anno indicativo
-                "durata_anni": 2,
-                "min_kw": 5
-            },
-            "scaldacqua pompa di calore": {
-                "incentivo_fisso_anno": 300,  # € fissi/anno indicativo
-                "durata_anni": 2,
-            }
-        }
+        if not zona_climatica and comune:
+            zona_climatica = risolvi_zona(comune)
 
-        tipo_lower = tipo_intervento.lower()
-        risultato = {"tipo_intervento": tipo_intervento}
-
-        # Moltiplicatore PA (PA ha incentivi leggermente più alti)
-        moltiplicatore_pa = 1.15 if tipo_soggetto.lower() == "pa" else 1.0
-
-        for chiave, dati in tariffe.items():
-            if chiave in tipo_lower:
-                durata = dati["durata_anni"]
-
-                if chiave == "solare termico" and superficie_mq:
-                    annuo = dati["tariffa_base_mq"] * superficie_mq * moltiplicatore_pa
-                    risultato["incentivo_annuo_eur"] = round(annuo, 2)
-                    risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
-                    risultato["durata_anni"] = durata
-                    risultato["base_calcolo"] = f"{superficie_mq} m² × {dati['tariffa_base_mq']} €/m²/anno"
-
-                elif chiave == "scaldacqua pompa di calore":
-                    annuo = dati["incentivo_fisso_anno"] * moltiplicatore_pa
-                    risultato["incentivo_annuo_eur"] = round(annuo, 2)
-                    risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
-                    risultato["durata_anni"] = durata
-                    risultato["base_calcolo"] = "Incentivo fisso per categoria B.3"
-
-                elif potenza_kw:
-                    annuo = dati["tariffa_base_kwh"] * potenza_kw * moltiplicatore_pa
-                    risultato["incentivo_annuo_eur"] = round(annuo, 2)
-                    risultato["incentivo_totale_eur"] = round(annuo * durata, 2)
-                    risultato["durata_anni"] = durata
-                    risultato["base_calcolo"] = f"{potenza_kw} kW × {dati['tariffa_base_kwh']} €/kW/anno"
-
-                else:
-                    risultato["nota"] = f"Specificare la potenza in kW (o i m² per solare termico) per ottenere una stima precisa."
-                    risultato["formula"] = f"Incentivo annuo ≈ {dati.get('tariffa_base_kwh', dati.get('tariffa_base_mq'))} × [kW o m²] per {durata} anni"
-
-                risultato["avvertenza"] = "⚠️ Stima indicativa. Il valore definitivo è calcolato dal GSE in sede di istruttoria."
-                break
-        else:
+        risultato = calcola_incentivo(
+            tipo_intervento,
+            potenza_kw=potenza_kw,
+            superficie_mq=superficie_mq,
+            tipo_soggetto=tipo_soggetto,
+        )
+        if risultato is None:
             yield Error(f"Tipo di intervento '{tipo_intervento}' non riconosciuto. Specificare: pompa di calore, solare termico, biomassa, caldaia a condensazione, scaldacqua pompa di calore.")
             return
+        if zona_climatica:
+            risultato["zona_climatica"] = zona_climatica
 
         yield risultato
         
@@ -288,71 +163,11 @@ def register_tools(tree: Tree):
         - tipo_accesso: "diretto" (incentivo < 5.000 €/anno) o "prenotazione" (incentivo ≥ 5.000 €/anno)
         """
 
-        # Documenti base (tutti gli interventi)
-        documenti_base = [
-            {"doc": "Relazione tecnica descrittiva", "obbligatorio": True, "note": "Firmata da tecnico abilitato (ingegnere, perito, geometra)"},
-            {"doc": "Documentazione fotografica ante-operam", "obbligatorio": True, "note": "Foto del vecchio impianto prima della sostituzione"},
-            {"doc": "Documentazione fotografica post-operam", "obbligatorio": True, "note": "Foto del nuovo impianto installato"},
-            {"doc": "Fatture/ricevute pagamento tracciabili", "obbligatorio": True, "note": "No contanti. Bonifico, carta o altro mezzo tracciabile"},
-            {"doc": "Schede tecniche componenti (con marcatura CE)", "obbligatorio": True, "note": "Del produttore, in italiano o con traduzione"},
-            {"doc": "Dichiarazione di conformità impianto", "obbligatorio": True, "note": "Modello CPI per impianti termici o dichiarazione D.M. 37/2008"},
-        ]
-
-        # Documenti specifici per tipo impianto
-        documenti_specifici = []
-
-        tipo_lower = tipo_intervento.lower()
-
-        if "pompa di calore" in tipo_lower:
-            documenti_specifici = [
-                {"doc": "Certificato test EN 14511 o EHPA Gold", "obbligatorio": True, "note": "Attestante COP ≥ soglia minima per la zona climatica"},
-                {"doc": "Documentazione dismissione vecchio generatore", "obbligatorio": True, "note": "Foto + dichiarazione tecnico dello smaltimento"},
-            ]
-
-        elif "solare" in tipo_lower:
-            documenti_specifici = [
-                {"doc": "Certificazione Solar Keymark", "obbligatorio": True, "note": "O certificazione europea equivalente EN 12975"},
-                {"doc": "Schema dell'impianto idraulico", "obbligatorio": True, "note": "Planimetria con posizionamento collettori"},
-            ]
-
-        elif "biomassa" in tipo_lower or "pellet" in tipo_lower:
-            documenti_specifici = [
-                {"doc": "Certificato emissioni EN 303-5", "obbligatorio": True, "note": "Classe 5 (5 stelle) obbligatoria per nuove installazioni"},
-                {"doc": "Analisi combustibile (se non pellet certificato)", "obbligatorio": False, "note": "Per biomassa non certificata"},
-            ]
-
-        # Documenti aggiuntivi per PA
-        documenti_pa = []
-        if tipo_soggetto.lower() == "pa":
-            documenti_pa = [
-                {"doc": "APE pre-intervento", "obbligatorio": True, "note": "Attestato Prestazione Energetica prima dei lavori"},
-                {"doc": "APE post-intervento", "obbligatorio": True, "note": "Attestato Prestazione Energetica dopo i lavori"},
-                {"doc": "Delibera/determinazione di affidamento lavori", "obbligatorio": True, "note": "Atto amministrativo di approvazione dell'intervento"},
-            ]
-
-        # Documenti per procedura a prenotazione
-        documenti_prenotazione = []
-        if tipo_accesso.lower() == "prenotazione":
-            documenti_prenotazione = [
-                {"doc": "Domanda di prenotazione preventiva", "obbligatorio": True, "note": "Da inviare PRIMA dell'avvio lavori"},
-                {"doc": "Preventivo dettagliato lavori", "obbligatorio": True, "note": "Con stima dell'incentivo annuo atteso"},
-            ]
-
-        checklist_completa = {
-            "tipo_intervento": tipo_intervento,
-            "tipo_soggetto": tipo_soggetto,
-            "procedura": tipo_accesso,
-            "documenti_base": documenti_base,
-            "documenti_specifici": documenti_specifici,
-            "documenti_pa": documenti_pa,
-            "documenti_prenotazione": documenti_prenotazione,
-            "totale_documenti": len(documenti_base) + len(documenti_specifici) + len(documenti_pa) + len(documenti_prenotazione),
-            "scadenza_invio": "Entro 60 giorni dalla data di fine lavori (accesso diretto)" if tipo_accesso == "diretto" else "Prenotazione PRIMA dei lavori, poi 12 mesi per completare"
-        }
+        checklist_completa = genera_checklist(tipo_intervento, tipo_soggetto, tipo_accesso)
 
         yield checklist_completa
         
-        obbligatori = sum(1 for d in documenti_base + documenti_specifici + documenti_pa + documenti_prenotazione if d.get("obbligatorio"))
+        obbligatori = sum(1 for sezione in SEZIONI_CHECKLIST for d in checklist_completa[sezione] if d.get("obbligatorio"))
         yield f"Checklist generata: {obbligatori} documenti obbligatori per {tipo_intervento} ({tipo_soggetto.upper()}). Scadenza: {checklist_completa['scadenza_invio']}"
 
 
@@ -383,40 +198,207 @@ def register_tools(tree: Tree):
             return
 
         try:
-            with client_manager.connect_to_client() as client:
-                pratiche = client.collections.get("Pratiche")
+            # Letture concorrenti della stessa pratica condividono una sola query
+            from weaviate.classes.query import Filter
+            lettura = await leggi(
+                client_manager,
+                StatoPratica,
+                "Pratiche",
+                filters=Filter.by_property("codice_pratica").equal(codice_pratica),
+                limit=1
+            )
+
+            if not lettura.records:
+                yield Error(f"Pratica '{codice_pratica}' non trovata nel sistema.")
+                return
+
+            pratica = lettura.records[0]
+
+            risposta = {
+                "pratica_trovata": True,
+                "dettagli": compatto(pratica),
+                "zona_climatica": risolvi_zona(pratica.indirizzo_impianto)
+            }
+            if lettura.stantio:
+                risposta["dati_non_aggiornati"] = True
+                risposta["aggiornati_a_secondi_fa"] = round(lettura.eta_s)
+            yield risposta
+
+            stato = pratica.stato or "N/D"
+            mancanti = pratica.documenti_mancanti or []
+            incentivo = pratica.incentivo_totale_stimato
+
+            msg = f"Pratica {codice_pratica}: stato '{stato}'."
+            if lettura.stantio:
+                msg = ("⚠️ Sistema pratiche momentaneamente non raggiungibile: dati di "
+                       f"{round(lettura.eta_s)} secondi fa, potrebbero non essere aggiornati. ") + msg
+            if mancanti:
+                msg += f" Documenti mancanti: {', '.join(mancanti)}."
+            if isinstance(incentivo, (int, float)):
+                msg += f" Incentivo totale stimato: €{incentivo:,.0f}."
+
+            yield msg
 
-                # Filtra per codice pratica
-                from weaviate.classes.query import Filter
-                results = pratiche.query.fetch_objects(
-                    filters=Filter.by_property("codice_pratica").equal(codice_pratica),
-                    limit=1
-                )
+        except Exception as e:
+            yield Error(f"Errore nel recupero della pratica: {str(e)}")
 
-                if not results.objects:
-                    yield Error(f"Pratica '{codice_pratica}' non trovata nel sistema.")
-                    return
 
-                pratica = results.objects[0].properties
+    # ─────────────────────────────────────────────────────────
+    # TOOL 5: Raccomanda impianti dal catalogo
+    # ─────────────────────────────────────────────────────────
+    @tool(tree=tree, end=False, status="🏷️ Cerco gli impianti più convenienti...")
+    async def raccomanda_impianti(
+        potenza_kw: float,
+        zona_climatica: str = None,
+        comune: str = None,
+        tolleranza_kw: float = 2.0,
+        tipo_soggetto: str = "privato",
+        top_k: int = 5,
+        client_manager=None
+    ):
+        """
+        Raccomanda le pompe di calore del catalogo ammissibili al Conto Termico
+        per una zona climatica e una potenza, ordinate per rapporto incentivo/prezzo.
+
+        Usa questo tool quando l'utente chiede:
+        - "Quale pompa di calore da circa 12 kW è ammissibile in zona E?"
+        - "Consigliami un impianto per la mia casa in zona D"
+        - "Qual è la pompa di calore più conveniente con il Conto Termico?"
 
-                yield {
-                    "pratica_trovata": True,
-                    "dettagli": pratica
-                }
+        Parametri:
+        - potenza_kw: potenza termica desiderata in kW
+        - zona_climatica: zona climatica A/B/C/D/E/F
+        - comune: comune o indirizzo, in alternativa alla zona climatica
+        - tolleranza_kw: scarto ammesso sulla potenza (default ±2 kW)
+        - tipo_soggetto: "privato" o "PA"
+        - top_k: numero di impianti da restituire (max 20)
+        - client_manager: client Weaviate iniettato da Elysia
+        """
 
-                stato = pratica.get("stato", "N/D")
-                mancanti = pratica.get("documenti_mancanti", [])
-                incentivo = pratica.get("incentivo_totale_stimato", "N/D")
+        if client_manager is None:
+            yield Error("Client Weaviate non disponibile. Configurare la connessione Weaviate.")
+            return
 
-                msg = f"Pratica {codice_pratica}: stato '{stato}'."
-                if mancanti:
-                    msg += f" Documenti mancanti: {', '.join(mancanti)}."
-                if isinstance(incentivo, (int, float)):
-                    msg += f" Incentivo totale stimato: €{incentivo:,.0f}."
+        if not zona_climatica and comune:
+            zona_climatica = risolvi_zona(comune)
+            if zona_climatica is None:
+                yield Error(f"Zona climatica non determinabile per '{comune}'. Indicare la zona (A-F).")
+                return
 
-                yield msg
+        zona = (zona_climatica or "").strip().upper()
+        if zona not in SOGLIE_COP:
+            yield Error(f"Zona climatica '{zona_climatica}' non valida. Usare A, B, C, D, E o F.")
+            return
+        soglia = SOGLIE_COP[zona]
+        top_k = max(1, min(top_k, 20))
 
+        try:
+            # Filtri (zone ammissibili, range su cop_a7w35 e potenza_kw) e ordinamento
+            # per incentivo/prezzo precalcolato sono lato server: i primi top_k sono i
+            # migliori dell'intero catalogo, qualunque sia la sua dimensione
+            from weaviate.classes.query import Filter, Sort
+            lettura = await leggi(
+                client_manager,
+                ImpiantoCandidato,
+                "Impianti",
+                filters=(
+                    Filter.by_property("zone_ammissibili").contains_any([zona])
+                    & Filter.by_property("cop_a7w35").greater_or_equal(soglia)
+                    & Filter.by_property("potenza_kw").greater_or_equal(potenza_kw - tolleranza_kw)
+                    & Filter.by_property("potenza_kw").less_or_equal(potenza_kw + tolleranza_kw)
+                    & Filter.by_property("incentivo_su_prezzo").greater_than(0)
+                ),
+                sort=Sort.by_property("incentivo_su_prezzo", ascending=False),
+                limit=top_k,
+            )
         except Exception as e:
-            yield Error(f"Errore nel recupero della pratica: {str(e)}")
+            yield Error(f"Errore nella ricerca degli impianti: {str(e)}")
+            return
+
+        raccomandati = []
+        for imp in lettura.records:
+            stima = calcola_incentivo(imp.tipo or "pompa di calore", potenza_kw=imp.potenza_kw, tipo_soggetto=tipo_soggetto)
+            prezzo = imp.prezzo_indicativo_eur
+            if not stima or "incentivo_totale_eur" not in stima or not prezzo:
+                continue
+            raccomandati.append({
+                **compatto(imp),
+                "incentivo_totale_eur": stima["incentivo_totale_eur"],
+                "incentivo_su_prezzo": round(stima["incentivo_totale_eur"] / prezzo, 3),
+            })
+
+        if not raccomandati:
+            yield Error(f"Nessuna pompa di calore ammissibile in zona {zona} tra {potenza_kw - tolleranza_kw:g} e {potenza_kw + tolleranza_kw:g} kW.")
+            return
+
+        yield {
+            "zona_climatica": zona,
+            "soglia_cop": soglia,
+            "potenza_richiesta_kw": potenza_kw,
+            "impianti": raccomandati,
+        }
+
+        migliore = raccomandati[0]
+        yield (f"{len(raccomandati)} impianti raccomandati per zona {zona} (COP ≥ {soglia}). "
+               f"Migliore rapporto incentivo/prezzo: {migliore['modello']} "
+               f"(incentivo ≈ €{migliore['incentivo_totale_eur']:,.0f} su €{migliore['prezzo_indicativo_eur']:,.0f}).")
+
+
+    # ─────────────────────────────────────────────────────────
+    # TOOL 6: Pratiche a cui manca un documento
+    # ─────────────────────────────────────────────────────────
+    @tool(tree=tree, end=False, status="🗂️ Cerco le pratiche con documenti mancanti...")
+    async def pratiche_con_documento_mancante(
+        documento: str,
+        limit: int = 50,
+        client_manager=None
+    ):
+        """
+        Elenca le pratiche a cui manca un determinato documento obbligatorio.
+
+        Usa questo tool quando l'utente chiede:
+        - "Quali pratiche non hanno ancora la dichiarazione di conformità?"
+        - "A chi manca l'APE post-intervento?"
+        - "Pratiche senza certificato EN 303-5"
+
+        Parametri:
+        - documento: nome (anche parziale) del documento, es. "dichiarazione di conformità"
+        - limit: numero massimo di pratiche restituite (default 50)
+        - client_manager: client Weaviate iniettato da Elysia
+        """
+
+        if client_manager is None:
+            yield Error("Client Weaviate non disponibile. Configurare la connessione Weaviate.")
+            return
+
+        id_documenti = cerca_documento(documento)
+        if not id_documenti:
+            yield Error(f"Documento '{documento}' non presente nel catalogo documentale.")
+            return
+
+        try:
+            # Un solo filtro sull'array indicizzato degli ID mancanti
+            from weaviate.classes.query import Filter
+            lettura = await leggi(
+                client_manager,
+                PraticaSintesi,
+                "Pratiche",
+                filters=Filter.by_property("documenti_mancanti_ids").contains_any(id_documenti),
+                limit=max(1, min(limit, 200)),
+            )
+        except Exception as e:
+            yield Error(f"Errore nella ricerca delle pratiche: {str(e)}")
+            return
+
+        pratiche = [compatto(p) for p in lettura.records]
+        nomi_documenti = [CATALOGO_DOCUMENTI[i] for i in id_documenti]
+
+        yield {
+            "documenti": nomi_documenti,
+            "pratiche": pratiche,
+            "dati_non_aggiornati": lettura.stantio,
+        }
+
+        yield f"{len(pratiche)} pratiche senza {' / '.join(nomi_documenti)}."
 
     return tree
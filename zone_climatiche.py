@@ -0,0 +1,195 @@
+"""
+zone_climatiche.py
+==================
+Risoluzione automatica comune → zona climatica (DPR 412/93).
+
+La tabella dei comuni (nome, provincia, zona, gradi giorno) è compilata in un
+file binario ordinato a record di larghezza fissa e letta via mmap: la
+ricerca esatta o per prefisso è una ricerca binaria, senza caricare la
+tabella in memoria. Le chiavi sono normalizzate (minuscolo, senza accenti né
+punteggiatura), quindi "forli", "Forlì" e "FORLI'" sono equivalenti.
+
+Il CSV incluso (dati/comuni_zone_climatiche.csv) contiene solo i capoluoghi
+di esempio: per la copertura completa dei ~7.900 comuni sostituirlo con la
+tabella ufficiale (stesso formato: comune;provincia;zona;gradi_giorno).
+
+Uso:
+    python zone_climatiche.py build [comuni.csv]
+    python zone_climatiche.py "Via Roma 15, Milano (MI)"
+"""
+
+import csv
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+from typing import NamedTuple
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_COMUNI = os.path.join(_DIR, "dati", "comuni_zone_climatiche.csv")
+BIN_COMUNI = os.path.join(_DIR, ".cache", "comuni_zone.bin")
+
+_MAGIC = b"CTZC"
+_VERSIONE = 1
+_HEADER = struct.Struct("<4sHI")
+# chiave normalizzata, nome visualizzato (UTF-8), provincia, zona, gradi giorno
+_RECORD = struct.Struct("<48s48s2s1sH")
+
+_RE_ZONA = re.compile(r"\bzona\s+([A-F])\b", re.IGNORECASE)
+_RE_COMUNE_PROVINCIA = re.compile(r"([^,\d()][^,()]*?)\s*\(([A-Za-z]{2})\)")
+
+
+class Comune(NamedTuple):
+    nome: str
+    provincia: str
+    zona: str
+    gradi_giorno: int
+
+
+def normalizza_nome(nome: str) -> str:
+    """Minuscolo, senza accenti; apostrofi e trattini diventano spazi."""
+    nome = unicodedata.normalize("NFKD", nome.casefold())
+    nome = "".join(c for c in nome if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", nome).split())
+
+
+def compila(csv_path: str = CSV_COMUNI, bin_path: str = BIN_COMUNI) -> int:
+    """Compila il CSV nel file binario ordinato. Restituisce il numero di comuni."""
+    record = []
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        for riga in csv.DictReader(f, delimiter=";"):
+            chiave = normalizza_nome(riga["comune"]).encode("utf-8")
+            nome = riga["comune"].strip().encode("utf-8")
+            if len(chiave) > 48 or len(nome) > 48:
+                raise ValueError(f"Nome comune troppo lungo per il record: {riga['comune']}")
+            zona = riga["zona"].strip().upper()
+            if zona not in "ABCDEF" or len(zona) != 1:
+                raise ValueError(f"Zona climatica non valida per {riga['comune']}: {zona}")
+            record.append((chiave, nome, riga["provincia"].strip().upper().encode("ascii"),
+                           zona.encode("ascii"), int(riga["gradi_giorno"])))
+
+    record.sort()
+    os.makedirs(os.path.dirname(bin_path), exist_ok=True)
+    tmp = bin_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSIONE, len(record)))
+        for r in record:
+            f.write(_RECORD.pack(*r))
+    os.replace(tmp, bin_path)
+    return len(record)
+
+
+class TabellaZone:
+    """Tabella comuni → zona climatica letta via mmap."""
+
+    def __init__(self, bin_path: str = BIN_COMUNI):
+        with open(bin_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, versione, self._n = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or versione != _VERSIONE:
+            raise ValueError(f"{bin_path} non è una tabella zone climatiche valida (ricompilare)")
+        # Vista indicizzabile sulle chiavi, per bisect senza materializzare la tabella
+        self._chiavi = _ChiaviMmap(self._mm, self._n)
+
+    def __len__(self):
+        return self._n
+
+    def _comune(self, i: int) -> Comune:
+        _, nome, provincia, zona, gg = _RECORD.unpack_from(self._mm, _HEADER.size + i * _RECORD.size)
+        return Comune(nome.rstrip(b"\0").decode("utf-8"), provincia.decode("ascii"), zona.decode("ascii"), gg)
+
+    def cerca(self, nome: str, provincia: str = None) -> list[Comune]:
+        """Comuni con nome esatto (normalizzato), eventualmente filtrati per provincia."""
+        chiave = normalizza_nome(nome).encode("utf-8")
+        risultati = []
+        i = bisect_left(self._chiavi, chiave)
+        while i < self._n and self._chiavi[i] == chiave:
+            comune = self._comune(i)
+            if provincia is None or comune.provincia == provincia.upper():
+                risultati.append(comune)
+            i += 1
+        return risultati
+
+    def prefisso(self, testo: str, limite: int = 10) -> list[Comune]:
+        """Comuni il cui nome normalizzato inizia con `testo`."""
+        prefisso = normalizza_nome(testo).encode("utf-8")
+        risultati = []
+        i = bisect_left(self._chiavi, prefisso)
+        while i < self._n and len(risultati) < limite and self._chiavi[i].startswith(prefisso):
+            risultati.append(self._comune(i))
+            i += 1
+        return risultati
+
+
+class _ChiaviMmap:
+    """Sequenza delle chiavi ordinate, lette direttamente dal mmap."""
+
+    def __init__(self, mm, n: int):
+        self._mm = mm
+        self._n = n
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i: int) -> bytes:
+        inizio = _HEADER.size + i * _RECORD.size
+        return self._mm[inizio:inizio + 48].rstrip(b"\0")
+
+
+@lru_cache(maxsize=1)
+def tabella() -> TabellaZone:
+    """Tabella condivisa; il file binario è ricompilato se manca o se il CSV è più recente."""
+    if not os.path.exists(BIN_COMUNI) or os.path.getmtime(BIN_COMUNI) < os.path.getmtime(CSV_COMUNI):
+        compila()
+    return TabellaZone()
+
+
+def risolvi_comune(testo: str):
+    """
+    Trova il comune in un nome o indirizzo, es. "Milano", "Via Roma 15, Milano (MI)".
+    Restituisce un Comune oppure None (comune sconosciuto o omonimo senza provincia).
+    """
+    tab = tabella()
+    m = _RE_COMUNE_PROVINCIA.search(testo)
+    if m:
+        trovati = tab.cerca(m.group(1), m.group(2))
+        if trovati:
+            return trovati[0]
+
+    # Altrimenti prova ogni segmento separato da virgole, dall'ultimo
+    for segmento in reversed(re.split(r"[,\-–]", testo)):
+        trovati = tab.cerca(segmento)
+        if len(trovati) == 1:
+            return trovati[0]
+    return None
+
+
+def risolvi_zona(testo: str):
+    """Zona climatica (A-F) da un indirizzo o nome di comune; None se non determinabile."""
+    if not testo:
+        return None
+    m = _RE_ZONA.search(testo)
+    if m:
+        return m.group(1).upper()
+    comune = risolvi_comune(testo)
+    return comune.zona if comune else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        csv_path = sys.argv[2] if len(sys.argv) > 2 else CSV_COMUNI
+        print(f"✅ Compilati {compila(csv_path)} comuni in {BIN_COMUNI}")
+    elif len(sys.argv) >= 2:
+        testo = " ".join(sys.argv[1:])
+        comune = risolvi_comune(testo)
+        if comune:
+            print(f"📍 {comune.nome} ({comune.provincia}): zona {comune.zona}, {comune.gradi_giorno} gradi giorno")
+        else:
+            suggerimenti = tabella().prefisso(testo, 5)
+            print("❓ Comune non trovato." + (f" Forse: {', '.join(c.nome for c in suggerimenti)}" if suggerimenti else ""))
+    else:
+        print('Uso: python zone_climatiche.py build [comuni.csv] | python zone_climatiche.py "<comune o indirizzo>"')